@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Group, Post
+from .search import matching_posts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +10,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        """ Ищем по полнотекстовому индексу вместо LIKE по тексту."""
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=matching_posts(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     """ Создаем управление группами в админке."""
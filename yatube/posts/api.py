@@ -0,0 +1,218 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET, require_POST
+
+from . import follows, pagecache, timeline
+from .models import Group, Post, TimelineEntry, User
+from .pagecache import anonymous_cache, conditional_page
+from .paginator import ValuesCursorPaginator, paginate
+from .routers import use_primary
+from .sqlite import retry_on_busy
+
+FEED_ORDERING = ('-pub_date', '-pk')
+
+
+def _image_url(name):
+    return Post._meta.get_field('image').storage.url(name) if name else None
+
+
+# Поле ответа: путь для ``values()`` и преобразование значения.
+FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', None),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', _image_url),
+    'comment_count': ('comment_count', None),
+}
+
+
+class ApiError(Exception):
+    """ Ошибка в параметрах запроса, отдается клиенту как 400. """
+
+
+def api_errors(view):
+    """ Ошибки параметров превращаются в JSON с кодом 400. """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+    return wrapper
+
+
+def api_view(view):
+    """ Только GET, ошибки параметров — JSON с кодом 400. """
+    return require_GET(api_errors(view))
+
+
+def _unauthorized():
+    return JsonResponse({'error': 'Нужна авторизация'}, status=401)
+
+
+def _fields(request):
+    """ Поля из ``?fields=id,text``, по умолчанию все. """
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(FIELDS)
+    names = list(dict.fromkeys(
+        name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise ApiError('Неизвестные поля: %s' % ', '.join(unknown))
+    if not names:
+        raise ApiError('Пустой список полей')
+    return names
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.PAG_VAL))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return min(max(limit, 1), settings.API_PAGE_MAX)
+
+
+def _serialize(row, fields, prefix=''):
+    item = {}
+    for name in fields:
+        lookup, convert = FIELDS[name]
+        value = row[prefix + lookup]
+        item[name] = convert(value) if convert else value
+    return item
+
+
+def _dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _feed(request, queryset, prefix='', ordering=FEED_ORDERING):
+    """ Страница ленты: строки ``values()`` без моделей и шаблонов. """
+    fields = _fields(request)
+    columns = [prefix + FIELDS[name][0] for name in fields]
+    columns += [name.lstrip('-') for name in ordering]
+    page = paginate(request, queryset.values(*dict.fromkeys(columns)),
+                    _limit(request), paginator_class=ValuesCursorPaginator,
+                    ordering=ordering)
+    return JsonResponse({
+        'results': [_serialize(row, fields, prefix) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@api_view
+@conditional_page('index')
+@anonymous_cache('index')
+def posts(request):
+    """ Главная лента. """
+    return _feed(request, Post.objects.all())
+
+
+@api_view
+@conditional_page('group:{slug}')
+@anonymous_cache('group:{slug}')
+def group_posts(request, slug):
+    """ Лента сообщества. """
+    group = get_object_or_404(Group, slug=slug)
+    return _feed(request, Post.objects.filter(group=group))
+
+
+@api_view
+@conditional_page('author:{username}')
+@anonymous_cache('author:{username}')
+def profile_posts(request, username):
+    """ Посты автора. """
+    author = get_object_or_404(User, username=username)
+    return _feed(request, Post.objects.filter(author=author))
+
+
+@api_view
+def follow_posts(request):
+    """ Лента подписок текущего пользователя. """
+    user = request.user
+    if not user.is_authenticated:
+        return _unauthorized()
+    if not request.GET.get('cursor'):
+        timeline.pull(user)
+        timeline.trim(user)
+    response = _feed(request, TimelineEntry.objects.filter(user=user),
+                     prefix='post__', ordering=timeline.TIMELINE_ORDERING)
+    # Поколения у ленты подписок нет; JSON собирается быстро, а 304
+    # экономит передачу, поэтому ETag считается по телу ответа.
+    etag = pagecache.page_etag(request, [
+        hashlib.md5(response.content).hexdigest()])
+    return pagecache.add_validators(
+        pagecache.conditional(request, etag) or response, etag)
+
+
+@api_view
+def posts_batch(request):
+    """ Несколько постов по ``?ids=1,2,3`` за один запрос.
+
+    Ответ пишется потоком по мере чтения из базы, в порядке id; id, которых
+    нет, перечисляются в ``missing``.
+    """
+    fields = _fields(request)
+    try:
+        ids = {int(pk) for pk in request.GET.get('ids', '').split(',') if pk}
+    except ValueError:
+        raise ApiError('ids должны быть числами')
+    if not ids or len(ids) > settings.API_BATCH_MAX:
+        raise ApiError('Нужно от 1 до %s id' % settings.API_BATCH_MAX)
+    columns = dict.fromkeys([FIELDS[name][0] for name in fields] + ['id'])
+    rows = (Post.objects.filter(pk__in=ids).order_by('pk')
+            .values(*columns).iterator(chunk_size=settings.PAG_VAL * 10))
+
+    def stream():
+        found = set()
+        yield '{"results": ['
+        for number, row in enumerate(rows):
+            found.add(row['id'])
+            yield (',' if number else '') + _dumps(_serialize(row, fields))
+        yield '], "missing": %s}' % _dumps(sorted(ids - found))
+
+    return StreamingHttpResponse(stream(), content_type='application/json')
+
+
+def _names(data, key):
+    names = data.get(key, [])
+    if (not isinstance(names, list)
+            or not all(isinstance(name, str) for name in names)):
+        raise ApiError('%s должен быть списком имен' % key)
+    return names
+
+
+@require_POST
+@use_primary
+@retry_on_busy
+@api_errors
+def follow_batch(request):
+    """ Подписки списками: ``{"follow": [...], "unfollow": [...]}``.
+
+    Имена авторов применяются пачками, ответ — число новых подписок,
+    отписок и имена, которых нет.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return _unauthorized()
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise ApiError('Тело запроса должно быть JSON')
+    if not isinstance(data, dict):
+        raise ApiError('Тело запроса должно быть объектом')
+    follow, unfollow = _names(data, 'follow'), _names(data, 'unfollow')
+    if len(follow) + len(unfollow) > settings.API_FOLLOW_BATCH_MAX:
+        raise ApiError('Не больше %s имен за запрос'
+                       % settings.API_FOLLOW_BATCH_MAX)
+    return JsonResponse(follows.apply_batch(user, follow, unfollow),
+                        json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,16 @@
+from django.db.backends.sqlite3 import base
+
+from posts import sqlite
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """ SQLite для нескольких процессов: каждое подключение в режиме WAL
+    с mmap и ``busy_timeout``, ``atomic()`` начинает BEGIN IMMEDIATE. """
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        sqlite.configure(connection)
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        sqlite.begin_immediate(self.cursor())
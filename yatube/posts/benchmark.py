@@ -0,0 +1,91 @@
+import math
+import time
+
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from .models import Post, TimelineEntry, User
+
+PERCENTILES = (50, 95, 99)
+
+# Разница меньше этой считается шумом при любом пороге.
+NOISE_MS = 2.0
+
+
+def percentile(samples, rank):
+    """ Перцентиль по ближайшему рангу. """
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(rank / 100 * len(ordered)) - 1, 0)]
+
+
+def scenarios():
+    """ Самые тяжелые случаи для каждого представления: автор с
+    наибольшим числом подписчиков, пост с наибольшим числом
+    комментариев и читатель с самой большой лентой. """
+    author = User.objects.order_by('-stats__followers_count').first()
+    post = Post.objects.order_by('-comment_count').select_related(
+        'author').first()
+    reader = User.objects.filter(
+        pk__in=TimelineEntry.objects.values('user_id'),
+    ).order_by('-stats__following_count').first()
+    found = {'index': (None, reverse('index'))}
+    if author is not None:
+        found['profile'] = (None, reverse('profile', args=[author.username]))
+    if post is not None:
+        found['post'] = (None, reverse(
+            'post', args=[post.author.username, post.pk]))
+    if reader is not None:
+        found['follow_index'] = (reader, reverse('follow_index'))
+    return found
+
+
+def measure(url, user=None, repeat=20):
+    """ Время и число запросов ``repeat`` холодных запросов к странице. """
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    durations, queries = [], 0
+    for _ in range(repeat):
+        cache.clear()
+        start = time.perf_counter()
+        response = client.get(url)
+        durations.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+        queries = max(queries, response.wsgi_request.query_stats.count)
+    result = {'queries': queries}
+    for rank in PERCENTILES:
+        result[f'p{rank}'] = round(percentile(durations, rank), 2)
+    return result
+
+
+def run(repeat=20):
+    """ Замеряем все представления на текущих данных. """
+    return {name: measure(url, user, repeat)
+            for name, (user, url) in scenarios().items()}
+
+
+def compare(baseline, results, threshold):
+    """ Список регрессий относительно сохраненных замеров.
+
+    Число запросов не должно расти вовсе, ``p95`` — больше чем на долю
+    ``threshold`` и ``NOISE_MS``.
+    """
+    regressions = []
+    for size, views in results.items():
+        for name, current in views.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            if current['queries'] > before['queries']:
+                regressions.append(
+                    f'{name} при {size}: запросов {current["queries"]} '
+                    f'вместо {before["queries"]}')
+            limit = max(before['p95'] * (1 + threshold),
+                        before['p95'] + NOISE_MS)
+            if current['p95'] > limit:
+                regressions.append(
+                    f'{name} при {size}: p95 {current["p95"]} мс '
+                    f'вместо {before["p95"]} мс')
+    return regressions
@@ -0,0 +1,228 @@
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from . import pagecache
+
+_MISSING = object()
+
+# Локальные слои всех экземпляров с одним LOCATION общие: Django создает
+# экземпляр кеша на каждый поток.
+_local_stores = {}
+_local_locks = {}
+
+FILL_POLL = 0.05
+
+
+class TieredCache(BaseCache):
+    """ Маленький LRU в памяти процесса перед общим кешем.
+
+    Общий слой задается в ``OPTIONS['SHARED']`` как обычная настройка
+    кеша: memcached в бою, ``FileBasedCache`` для нескольких воркеров
+    локально, ``LocMemCache`` в тестах. В локальный слой попадают только
+    ключи с префиксами ``LOCAL_PREFIXES``: под такими ключами значение не
+    меняется (версия входит в ключ), поэтому копия в процессе не бывает
+    устаревшей, а удаление в другом воркере ей не нужно. Счетчики,
+    поколения и блокировки всегда идут в общий слой. Локальные значения
+    не копируются, храните в них только неизменяемые объекты.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        shared = dict(options['SHARED'])
+        backend = import_string(shared.pop('BACKEND'))
+        self.shared = backend(shared.pop('LOCATION', location), shared)
+        self.local_prefixes = tuple(options.get('LOCAL_PREFIXES', ()))
+        self.local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self._local = _local_stores.setdefault(location, OrderedDict())
+        self._lock = _local_locks.setdefault(location, threading.Lock())
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _remember(self, key, value, timeout, version):
+        if not key.startswith(self.local_prefixes):
+            return
+        deadline = time.time() + self.local_timeout
+        if timeout is not None:
+            deadline = min(deadline, time.time() + timeout)
+        local_key = self.make_key(key, version)
+        with self._lock:
+            self._local[local_key] = (value, deadline)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _recall(self, key, version):
+        if not key.startswith(self.local_prefixes):
+            return _MISSING
+        local_key = self.make_key(key, version)
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            value, deadline = entry
+            if deadline <= time.time():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+            return value
+
+    def _forget(self, key, version):
+        with self._lock:
+            self._local.pop(self.make_key(key, version), None)
+
+    def get(self, key, default=None, version=None):
+        value = self._recall(key, version)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version)
+            if value is _MISSING:
+                return default
+            self._remember(key, value, None, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, remote = {}, []
+        for key in keys:
+            value = self._recall(key, version)
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version)
+            for key, value in fetched.items():
+                self._remember(key, value, None, version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        self.shared.set(key, value, timeout, version)
+        self._remember(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._remember(key, value, timeout, version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(key, value, timeout, version)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, self._timeout(timeout), version)
+
+    def delete(self, key, version=None):
+        self._forget(key, version)
+        self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._forget(key, version)
+        self.shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return (self._recall(key, version) is not _MISSING
+                or self.shared.has_key(key, version))
+
+    def incr(self, key, delta=1, version=None):
+        self._forget(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        self._forget(key, version)
+        return self.shared.decr(key, delta, version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+def invalidate(*tags):
+    """ Сбрасываем все записи ``get_or_set`` с этими тегами.
+
+    Теги — те же ленты, что у кеша страниц (``post:42``,
+    ``author:VG``, ``group:slug``), поэтому сигналы моделей уже
+    сбрасывают их при правках.
+    """
+    pagecache.bump(*tags)
+
+
+def _fresh(entry, versions):
+    return entry is not None and entry[1] == versions
+
+
+def _wait(key, lock, versions):
+    """ Ждем, пока значение заполнит тот, кто взял блокировку. """
+    deadline = time.monotonic() + settings.CACHE_FILL_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(FILL_POLL)
+        entry = cache.get(key)
+        if _fresh(entry, versions):
+            return entry[0]
+        if not cache.has_key(lock):
+            break
+    return _MISSING
+
+
+def get_or_set(key, fill, timeout, tags=(), beta=1.0):
+    """ Значение из кеша или результат ``fill()`` с защитой от лавины.
+
+    Запись действительна, пока не сдвинулся ни один из ``tags``.
+    Заполняет только тот, кто взял блокировку ``fill-lock:<key>``:
+    остальные получают прежнее значение, если оно еще действительно,
+    или ждут нового до ``CACHE_FILL_TIMEOUT`` секунд. Незадолго до
+    истечения запись пересчитывается заранее с вероятностью, растущей
+    к сроку и с ценой заполнения (XFetch, ``beta`` — смелость), так что
+    горячий ключ не истекает у всех воркеров разом. ``timeout`` —
+    секунды; ``None`` из ``fill`` возвращается, но не кешируется.
+    """
+    versions = pagecache.generations(tags) if tags else []
+    entry = cache.get(key)
+    stale = _MISSING
+    if _fresh(entry, versions):
+        value, _, expires, cost = entry
+        if time.time() - cost * beta * math.log(1 - random.random()) < expires:
+            return value
+        stale = value
+    lock = f'fill-lock:{key}'
+    locked = cache.add(lock, 1, settings.CACHE_FILL_TIMEOUT)
+    if not locked:
+        if stale is not _MISSING:
+            return stale
+        value = _wait(key, lock, versions)
+        if value is not _MISSING:
+            return value
+    try:
+        start = time.perf_counter()
+        value = fill()
+        cost = time.perf_counter() - start
+        if value is not None:
+            # Запись живет дольше срока, чтобы ее можно было отдавать,
+            # пока ее пересчитывает другой воркер.
+            cache.set(key, (value, versions, time.time() + timeout, cost),
+                      timeout + settings.CACHE_FILL_TIMEOUT)
+        return value
+    finally:
+        if locked:
+            cache.delete(lock)
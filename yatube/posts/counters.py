@@ -0,0 +1,85 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def compute_stats(user_id):
+    """ Считаем счетчики пользователя напрямую по таблицам. """
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def get_user_stats(user):
+    """ Возвращаем строку счетчиков, создавая ее при первом обращении. """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(
+            user=user, defaults=compute_stats(user.pk))
+        return stats
+
+
+def bump_user_stats(user_id, **deltas):
+    """ Сдвигаем счетчики пользователя одним UPDATE.
+
+    Если строки еще нет, она создается с уже пересчитанными значениями,
+    поэтому дельту к ней прибавлять не нужно. Для отрицательных дельт
+    строка не создается: при каскадном удалении пользователя она бы
+    пережила своего владельца.
+    """
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{name: F(name) + delta for name, delta in deltas.items()})
+    if updated or min(deltas.values()) < 0:
+        return
+    if User.objects.filter(pk=user_id).exists():
+        UserStats.objects.get_or_create(user_id=user_id,
+                                        defaults=compute_stats(user_id))
+
+
+def bump_users_stats(user_ids, **deltas):
+    """ Сдвигаем одни и те же счетчики пачки пользователей одним UPDATE.
+
+    Недостающие строки не создаются: ``get_user_stats`` посчитает их
+    по таблицам при первом обращении.
+    """
+    return UserStats.objects.filter(user_id__in=user_ids).update(
+        **{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def bump_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta)
+
+
+def bump_post_version(post_id):
+    """ Новая версия поста сбрасывает закешированную карточку. """
+    Post.objects.filter(pk=post_id).update(version=F('version') + 1)
+
+
+def _count_of(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=Count('pk')).values('total')), 0)
+
+
+def recount_comments(posts=None):
+    """ Пересчитываем ``Post.comment_count`` одним UPDATE. """
+    posts = Post.objects.all() if posts is None else posts
+    return posts.update(comment_count=_count_of(Comment.objects, 'post'))
+
+
+def recount_user_stats(users=None):
+    """ Пересчитываем счетчики пользователей пачкой. """
+    users = User.objects.all() if users is None else users
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in users.values_list('pk', flat=True)],
+        ignore_conflicts=True)
+    return UserStats.objects.filter(user__in=users).update(
+        posts_count=_count_of(Post.objects, 'author'),
+        followers_count=_count_of(Follow.objects, 'author'),
+        following_count=_count_of(Follow.objects, 'user'),
+    )
@@ -0,0 +1,244 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+from . import pagecache, suggestions, timeline
+from .counters import bump_user_stats, bump_users_stats
+from .models import Follow, User
+
+
+def _following_key(user_id):
+    return f'follows:following:{user_id}'
+
+
+def following_ids(user_id):
+    """ Множество id авторов, на которых подписан пользователь.
+
+    Кешируется, только если в нем не больше ``FOLLOW_SET_MAX`` id: для
+    больших списков в кеше лежит отметка, а функция возвращает None, и
+    проверки идут запросами по индексу.
+    """
+    key = _following_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        limit = settings.FOLLOW_SET_MAX
+        ids = frozenset(Follow.objects.filter(user_id=user_id)
+                        .values_list('author_id', flat=True)[:limit + 1])
+        if len(ids) > limit:
+            ids = False
+        cache.set(key, ids, settings.FOLLOW_SET_TIMEOUT)
+    return None if ids is False else ids
+
+
+def forget(user_id):
+    """ Сбрасываем множество подписок пользователя.
+
+    Сбрасываем сразу и еще раз после коммита: в промежутке другой
+    запрос мог положить в кеш множество без этой подписки.
+    """
+    key = _following_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def is_following(user, author):
+    """ Подписан ли ``user`` на ``author``.
+
+    Ответ из множества ``following_ids``; для слишком длинных списков
+    подписок — один запрос по индексу ``unique_followers``.
+    """
+    if not user.is_authenticated or user.pk == author.pk:
+        return False
+    ids = following_ids(user.pk)
+    if ids is not None:
+        return author.pk in ids
+    return Follow.objects.filter(user=user, author=author).exists()
+
+
+def following_among(user, author_ids):
+    """ Те из ``author_ids``, на кого подписан ``user``: из множества
+    ``following_ids`` или одним запросом. """
+    author_ids = set(author_ids)
+    if not user.is_authenticated or not author_ids:
+        return set()
+    ids = following_ids(user.pk)
+    if ids is not None:
+        return author_ids & ids
+    return set(Follow.objects.filter(user=user, author_id__in=author_ids)
+               .values_list('author_id', flat=True))
+
+
+def relations(viewer, author, person_ids, followers=True):
+    """ Флаги строк страницы подписчиков или подписок ``author``.
+
+    Возвращает два множества из ``person_ids``: на кого подписан
+    ``viewer`` и с кем подписка взаимна (для подписчиков — на кого из
+    них подписан сам ``author``, для подписок — кто подписан на него).
+    Оба флага — один запрос по индексу ``unique_followers`` и индексам
+    списков, сколько бы подписчиков ни было у автора.
+    """
+    person_ids = set(person_ids)
+    if not person_ids:
+        return set(), set()
+    if followers:
+        condition = Q(user=author, author_id__in=person_ids)
+    else:
+        condition = Q(author=author, user_id__in=person_ids)
+    if viewer.is_authenticated:
+        condition |= Q(user=viewer, author_id__in=person_ids)
+    viewed, mutual = set(), set()
+    for user_id, author_id in (Follow.objects.filter(condition)
+                               .values_list('user_id', 'author_id')):
+        if user_id == viewer.pk:
+            viewed.add(author_id)
+        if followers and user_id == author.pk:
+            mutual.add(author_id)
+        elif not followers and author_id == author.pk:
+            mutual.add(user_id)
+    return viewed & person_ids, mutual & person_ids
+
+
+def _execute(sql, params):
+    with connections[router.db_for_write(Follow)].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _returned(sql, params):
+    with connections[router.db_for_write(Follow)].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _columns():
+    opts = Follow._meta
+    connection = connections[router.db_for_write(Follow)]
+    quote = connection.ops.quote_name
+    return (connection, quote(opts.db_table),
+            quote(opts.get_field('user').column),
+            quote(opts.get_field('author').column))
+
+
+def follow(user, author):
+    """ Подписываем одним INSERT, повтор ничего не делает.
+
+    Дубликат отсекает ограничение ``unique_followers``, поэтому гонки
+    между чтением и записью нет. Сигнал ``post_save`` (счетчики, лента,
+    кеш) отправляется, только если строка действительно добавлена.
+    Возвращает True для новой подписки.
+    """
+    if user.pk == author.pk:
+        return False
+    connection, table, user_column, author_column = _columns()
+    ops = connection.ops
+    with transaction.atomic(using=connection.alias):
+        created = _execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} {table} '
+            f'({user_column}, {author_column}) VALUES (%s, %s) '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            [user.pk, author.pk]) == 1
+        if created:
+            post_save.send(sender=Follow, created=True, raw=False,
+                           instance=Follow(user=user, author=author),
+                           using=connection.alias, update_fields=None)
+    return created
+
+
+def unfollow(user, author):
+    """ Отписываем одним DELETE, повтор ничего не делает.
+
+    Сигнал ``post_delete`` отправляется, только если строка удалена,
+    поэтому два одновременных запроса не уменьшат счетчики дважды.
+    """
+    connection, table, user_column, author_column = _columns()
+    with transaction.atomic(using=connection.alias):
+        deleted = _execute(
+            f'DELETE FROM {table} '
+            f'WHERE {user_column} = %s AND {author_column} = %s',
+            [user.pk, author.pk]) == 1
+        if deleted:
+            post_delete.send(sender=Follow,
+                             instance=Follow(user=user, author=author),
+                             using=connection.alias)
+    return deleted
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _follow_chunk(user, authors):
+    """ Подписываем на пачку авторов, возвращаем id новых подписок. """
+    connection, table, user_column, author_column = _columns()
+    ops = connection.ops
+    values = ', '.join(['(%s, %s)'] * len(authors))
+    followed = _returned(
+        f'{ops.insert_statement(ignore_conflicts=True)} {table} '
+        f'({user_column}, {author_column}) VALUES {values} '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)} '
+        f'RETURNING {author_column}',
+        [value for pk in authors for value in (user.pk, pk)])
+    if followed:
+        suggestions.forget(user.pk, followed)
+        timeline.backfill_authors(user.pk, followed)
+    return followed
+
+
+def _unfollow_chunk(user, authors):
+    """ Отписываем от пачки авторов, возвращаем id удаленных подписок. """
+    connection, table, user_column, author_column = _columns()
+    placeholders = ', '.join(['%s'] * len(authors))
+    unfollowed = _returned(f'DELETE FROM {table} WHERE {user_column} = %s '
+                           f'AND {author_column} IN ({placeholders}) '
+                           f'RETURNING {author_column}',
+                           [user.pk, *authors])
+    if unfollowed:
+        timeline.prune_authors(user.pk, unfollowed)
+    return unfollowed
+
+
+def _apply(user, names, apply, sign, result, key, changed):
+    for chunk in _chunks(list(dict.fromkeys(names)),
+                         settings.FOLLOW_BATCH_SIZE):
+        authors = dict(User.objects.filter(username__in=chunk)
+                       .exclude(pk=user.pk).values_list('pk', 'username'))
+        known = set(authors.values()) | {user.username}
+        result['unknown'] += [name for name in chunk if name not in known]
+        if not authors:
+            continue
+        with transaction.atomic(using=router.db_for_write(Follow)):
+            done = apply(user, list(authors))
+            if not done:
+                continue
+            bump_user_stats(user.pk, following_count=sign * len(done))
+            bump_users_stats(done, followers_count=sign)
+            forget(user.pk)
+        result[key] += len(done)
+        changed.update(authors[pk] for pk in done)
+
+
+def apply_batch(user, follow=(), unfollow=()):
+    """ Подписываем и отписываем ``user`` списками имен авторов.
+
+    Списки обрабатываются пачками по ``FOLLOW_BATCH_SIZE``, каждая
+    пачка — один INSERT или DELETE с ``RETURNING`` (SQLite 3.35+,
+    PostgreSQL) в своей транзакции. Сигналы не отправляются: счетчики
+    сдвигаются на число действительно добавленных или удаленных строк
+    двумя UPDATE на пачку, лента подписок — одним INSERT или DELETE по
+    авторам пачки и одной обрезкой в конце. Возвращает число новых
+    подписок, отписок и неизвестные имена.
+    """
+    result = {'followed': 0, 'unfollowed': 0, 'unknown': []}
+    changed = set()
+    _apply(user, follow, _follow_chunk, 1, result, 'followed', changed)
+    _apply(user, unfollow, _unfollow_chunk, -1, result, 'unfollowed',
+           changed)
+    if result['followed'] or result['unfollowed']:
+        pagecache.bump(f'author:{user.username}',
+                       *(f'author:{name}' for name in changed))
+    if result['followed']:
+        timeline.trim(user)
+    return result
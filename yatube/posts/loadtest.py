@@ -0,0 +1,115 @@
+import re
+import sys
+import time
+from collections import defaultdict
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+
+from django.urls import Resolver404, resolve
+
+from .benchmark import PERCENTILES, percentile
+
+LOG_LINE = re.compile(r'"(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[\d.]+"')
+
+REPLAYED_METHODS = ('GET', 'HEAD')
+
+
+def environ_for(method, path, data=None, cookie=''):
+    """ WSGI-окружение запроса, как его собрал бы веб-сервер. """
+    url = urlsplit(path)
+    body = urlencode(data).encode() if data else b''
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def call(application, environ):
+    """ Выполняем запрос целиком, вместе с телом ответа и ``close()``,
+    и возвращаем статус и время в миллисекундах. """
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    start = time.perf_counter()
+    result = application(environ, start_response)
+    try:
+        for _ in result:
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return statuses[0], (time.perf_counter() - start) * 1000
+
+
+def url_name(path):
+    try:
+        return resolve(urlsplit(path).path).url_name or 'unnamed'
+    except Resolver404:
+        return 'unresolved'
+
+
+def read_log(lines):
+    """ Запросы из журнала веб-сервера в формате common/combined.
+
+    Повторяются только GET и HEAD: тел POST-запросов в журнале нет.
+    """
+    for line in lines:
+        match = LOG_LINE.search(line)
+        if match and match['method'] in REPLAYED_METHODS:
+            yield match['method'], match['path']
+
+
+def summarize(samples, elapsed):
+    """ Сводка по именам URL: число запросов, ошибки и перцентили.
+
+    ``samples`` — тройки ``(имя, статус, мс)``, статус и время ``None``
+    означают исключение. Ошибкой считается исключение или ответ 5xx.
+    Запросы с исключением в перцентили не входят: времени ответа у них
+    нет, а нулевое время занизило бы задержки.
+    """
+    requests = defaultdict(int)
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for name, status, duration in samples:
+        requests[name] += 1
+        if duration is not None:
+            durations[name].append(duration)
+        if status is None or status >= 500:
+            errors[name] += 1
+    views = {}
+    for name, count in sorted(requests.items()):
+        views[name] = {'requests': count, 'errors': errors[name],
+                       'error_rate': errors[name] / count}
+        for rank in PERCENTILES:
+            views[name][f'p{rank}'] = (
+                round(percentile(durations[name], rank), 2)
+                if durations[name] else None)
+    total = len(samples)
+    failed = sum(errors.values())
+    return {
+        'requests': total,
+        'errors': failed,
+        'elapsed': round(elapsed, 3),
+        'throughput': round(total / elapsed, 1) if elapsed else 0.0,
+        'error_rate': failed / total if total else 0.0,
+        'views': views,
+    }
@@ -0,0 +1,80 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет главные страницы на синтетических данных разного '
+            'объема и сравнивает с сохраненным базовым уровнем.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000',
+                            help='Число постов на каждом шаге через запятую.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p95, доля.')
+        parser.add_argument('--baseline', default=os.path.join(
+            settings.BASE_DIR, 'benchmarks', 'baseline.json'))
+        parser.add_argument('--save', action='store_true',
+                            help='Записать результаты как базовый уровень.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        # Данные создаются в отдельной базе рядом с рабочей и удаляются
+        # после замеров.
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        test_settings.setdefault('NAME', os.path.join(
+            settings.BASE_DIR, 'benchmark.sqlite3'))
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            results = self._run(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self._report(results)
+        if options['save']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w') as baseline:
+                json.dump(results, baseline, indent=2, sort_keys=True)
+            self.stdout.write(f'Базовый уровень: {options["baseline"]}')
+            return
+        if not os.path.exists(options['baseline']):
+            self.stdout.write('Базового уровня нет, сравнение пропущено.')
+            return
+        with open(options['baseline']) as baseline:
+            regressions = benchmark.compare(
+                json.load(baseline), results, options['threshold'])
+        if regressions:
+            raise CommandError('Регрессии:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+
+    def _run(self, sizes, options):
+        results, seeded = {}, 0
+        for size in sizes:
+            # Пропорции 1M постов, 100k пользователей, 10M подписок.
+            added = size - seeded
+            call_command('seed_scale', users=max(added // 10, 2),
+                         posts=added, follows=added * 10,
+                         comments=added * 3, timeline_users=100,
+                         seed=options['seed'] + size, prefix='bench',
+                         stdout=self.stdout)
+            seeded = size
+            with override_settings(DEBUG=False, ANONYMOUS_PAGE_CACHE=False):
+                results[str(size)] = benchmark.run(options['repeat'])
+        return results
+
+    def _report(self, results):
+        for size, views in results.items():
+            for name, result in views.items():
+                self.stdout.write(
+                    f'{size:>10} {name:<14} запросов {result["queries"]:>3}'
+                    f'  p50 {result["p50"]:>8} мс  p95 {result["p95"]:>8} мс'
+                    f'  p99 {result["p99"]:>8} мс')
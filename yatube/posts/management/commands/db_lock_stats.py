@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import sqlite
+
+
+class Command(BaseCommand):
+    help = ('Показывает транзакции записи, ожидания блокировки SQLite '
+            'и ошибки SQLITE_BUSY (режим SQLITE_CONCURRENT).')
+
+    def handle(self, *args, **options):
+        stats = sqlite.stats()
+        self.stdout.write(
+            f"Транзакций: {stats['transactions']}, "
+            f"ожиданий: {stats['waits']}, "
+            f"в среднем {stats['avg_wait_ms']:.1f} мс, "
+            f"SQLITE_BUSY: {stats['busy']}, повторов: {stats['retries']}")
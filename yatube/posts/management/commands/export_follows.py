@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = ('Выводит имена авторов, на которых подписан пользователь, '
+            'по одному в строке — в формате import_follows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--followers', action='store_true',
+                            help='Вывести подписчиков пользователя.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["username"]}')
+        if options['followers']:
+            follows, field = Follow.objects.filter(author=user), 'user'
+        else:
+            follows, field = Follow.objects.filter(user=user), 'author'
+        names = follows.order_by(f'{field}__username').values_list(
+            f'{field}__username', flat=True)
+        for name in names.iterator():
+            self.stdout.write(name)
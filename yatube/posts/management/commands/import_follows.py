@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import follows
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Подписывает пользователя на авторов из файла (одно имя в '
+            'строке, "-" — стандартный ввод) пачками, в обход сигналов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--unfollow', action='store_true',
+                            help='Отписать от авторов из файла.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["username"]}')
+        if options['path'] == '-':
+            names = self._read(sys.stdin)
+        else:
+            with open(options['path']) as lines:
+                names = self._read(lines)
+        if options['unfollow']:
+            result = follows.apply_batch(user, unfollow=names)
+        else:
+            result = follows.apply_batch(user, follow=names)
+        for name in result['unknown']:
+            self.stderr.write(f'Нет пользователя {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Новых подписок: {result["followed"]}, '
+            f'отписок: {result["unfollowed"]}, '
+            f'неизвестных имен: {len(result["unknown"])}'))
+
+    def _read(self, lines):
+        return [line.strip() for line in lines if line.strip()]
@@ -0,0 +1,171 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth import SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from posts import loadtest
+from posts.models import Group, Post, User
+
+DEFAULT_MIX = ('index=40,group=15,profile=15,follow_index=15,'
+               'post_new=5,add_comment=10')
+
+SAMPLE = 1000
+
+
+def _ms(value):
+    # Перцентилей нет, если все запросы вида упали с исключением.
+    return f'{"—" if value is None else value:>8}'
+
+
+class Command(BaseCommand):
+    help = ('Нагружает yatube.wsgi.application из пула потоков в этом же '
+            'процессе смесью чтений и записей или повтором журнала '
+            'веб-сервера. Записи создаются в текущей базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Доли запросов по именам URL.')
+        parser.add_argument('--users', type=int, default=20,
+                            help='Сколько пользователей авторизовать.')
+        parser.add_argument('--replay', metavar='ACCESS_LOG',
+                            help='Повторить GET-запросы из журнала.')
+        parser.add_argument('--json', metavar='PATH',
+                            help='Сохранить сводку в JSON.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        from yatube.wsgi import application
+
+        self.rng = random.Random(options['seed'])
+        self.sessions = []
+        try:
+            if options['replay']:
+                jobs = self._replay(options['replay'], options['requests'])
+            else:
+                jobs = self._mix(options)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['threads']) as executor:
+                samples = list(executor.map(
+                    lambda job: self._execute(application, *job), jobs))
+            summary = loadtest.summarize(samples,
+                                         time.perf_counter() - start)
+        finally:
+            engine = import_module(settings.SESSION_ENGINE)
+            for session_key in self.sessions:
+                engine.SessionStore(session_key).delete()
+        self._report(summary)
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump(summary, output, indent=2, ensure_ascii=False)
+
+    def _execute(self, application, name, method, path, data, cookie):
+        environ = loadtest.environ_for(method, path, data, cookie)
+        try:
+            status, duration = loadtest.call(application, environ)
+        except Exception:
+            return name, None, None
+        return name, status, duration
+
+    def _replay(self, log_path, limit):
+        with open(log_path) as log:
+            requests = list(loadtest.read_log(log))
+        if not requests:
+            raise CommandError('В журнале нет GET-запросов.')
+        return [(loadtest.url_name(path), method, path, None, '')
+                for method, path in requests[:limit]]
+
+    def _login(self, user):
+        # То же, что делает django.contrib.auth.login, но без запроса.
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        self.sessions.append(session.session_key)
+        token = get_random_string(64)
+        return token, (f'{settings.SESSION_COOKIE_NAME}={session.session_key};'
+                       f' {settings.CSRF_COOKIE_NAME}={token}')
+
+    def _mix(self, options):
+        try:
+            mix = {name: float(share) for name, share in (
+                part.split('=') for part in options['mix'].split(','))}
+        except ValueError:
+            raise CommandError(f'Неверная смесь: {options["mix"]}')
+        unknown = set(mix) - set(self.BUILDERS)
+        if unknown:
+            raise CommandError(f'Неизвестные URL: {", ".join(unknown)}')
+        users = list(User.objects.order_by('?')[:options['users']])
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        self.usernames = list(User.objects.order_by('?').values_list(
+            'username', flat=True)[:SAMPLE])
+        self.posts = list(Post.objects.order_by('?').values_list(
+            'pk', 'author__username')[:SAMPLE])
+        if not users or not self.posts or (mix.get('group')
+                                           and not self.groups):
+            raise CommandError('Мало данных: сначала запустите seed_scale.')
+        self.logins = [self._login(user) for user in users]
+        names = self.rng.choices(list(mix), weights=list(mix.values()),
+                                 k=options['requests'])
+        return [self.BUILDERS[name](self) for name in names]
+
+    def _text(self):
+        return f'Нагрузочный тест {get_random_string(12)}'
+
+    def _index(self):
+        return 'index', 'GET', reverse('index'), None, ''
+
+    def _group(self):
+        return ('group', 'GET', reverse('group', args=[
+            self.rng.choice(self.groups)]), None, '')
+
+    def _profile(self):
+        return ('profile', 'GET', reverse('profile', args=[
+            self.rng.choice(self.usernames)]), None, '')
+
+    def _follow_index(self):
+        _, cookie = self.rng.choice(self.logins)
+        return 'follow_index', 'GET', reverse('follow_index'), None, cookie
+
+    def _post_new(self):
+        token, cookie = self.rng.choice(self.logins)
+        return ('new_post', 'POST', reverse('new_post'),
+                {'text': self._text(), 'csrfmiddlewaretoken': token}, cookie)
+
+    def _add_comment(self):
+        token, cookie = self.rng.choice(self.logins)
+        post_id, username = self.rng.choice(self.posts)
+        return ('add_comment', 'POST',
+                reverse('add_comment', args=[username, post_id]),
+                {'text': self._text(), 'csrfmiddlewaretoken': token}, cookie)
+
+    BUILDERS = {
+        'index': _index,
+        'group': _group,
+        'profile': _profile,
+        'follow_index': _follow_index,
+        'post_new': _post_new,
+        'add_comment': _add_comment,
+    }
+
+    def _report(self, summary):
+        for name, view in summary['views'].items():
+            self.stdout.write(
+                f'{name:<16} {view["requests"]:>6}'
+                f'  p50 {_ms(view["p50"])} мс  p95 {_ms(view["p95"])} мс'
+                f'  p99 {_ms(view["p99"])} мс'
+                f'  ошибок {view["errors"]} ({view["error_rate"]:.1%})')
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов: {summary["requests"]} за {summary["elapsed"]} с, '
+            f'{summary["throughput"]} в секунду, '
+            f'ошибок {summary["errors"]} ({summary["error_rate"]:.1%})'))
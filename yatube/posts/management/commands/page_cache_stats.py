@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import pagecache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кеша страниц для гостей.'
+
+    def handle(self, *args, **options):
+        stats = pagecache.stats()
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+            f"доля попаданий: {stats['hit_ratio']:.1%}")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_comments, recount_user_stats
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики комментариев, постов и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Сколько строк пересчитывать за транзакцию.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = self._recount(Post.objects, recount_comments, batch_size)
+        users = self._recount(User.objects, recount_user_stats, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано постов: {posts}, пользователей: {users}'))
+
+    def _recount(self, manager, recount, batch_size):
+        total, last_pk = 0, 0
+        while True:
+            pks = list(manager.filter(pk__gt=last_pk).order_by('pk')
+                       .values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return total
+            with transaction.atomic():
+                total += recount(manager.filter(pk__in=pks))
+            last_pk = pks[-1]
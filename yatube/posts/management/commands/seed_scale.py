@@ -0,0 +1,185 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import pagecache, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = ('кот', 'собака', 'город', 'море', 'лес', 'книга', 'музыка', 'кино',
+         'поезд', 'дорога', 'дом', 'утро', 'вечер', 'зима', 'лето', 'река',
+         'гора', 'друг', 'работа', 'отпуск', 'кофе', 'чай', 'снег', 'дождь',
+         'солнце', 'фото', 'рецепт', 'игра', 'сад', 'небо')
+
+HISTORY = timedelta(days=365)
+
+
+def zipf_weights(count, skew):
+    """ Веса закона Ципфа: у ``k``-го по популярности вес ``1 / k**skew``. """
+    return [1 / rank ** skew for rank in range(1, count + 1)]
+
+
+def distribute(total, weights, cap):
+    """ Делим ``total`` пропорционально весам так, чтобы никому не
+    досталось больше ``cap``; излишек уходит менее популярным. """
+    suffix = list(accumulate(reversed(weights)))[::-1] + [0]
+    capped = 0
+    while capped < len(weights):
+        scale = (total - capped * cap) / suffix[capped]
+        if weights[capped] * scale <= cap:
+            break
+        capped += 1
+    else:
+        return [cap] * len(weights)
+    return [cap] * capped + [round(weight * scale)
+                             for weight in weights[capped:]]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """ Отключаем ``auto_now_add``, чтобы задать даты из прошлого. """
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Создает большой набор данных с неравномерным распределением '
+            'подписчиков, постов и комментариев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель степенного распределения.')
+        parser.add_argument('--timeline-users', type=int, default=1000,
+                            help='Скольким пользователям собрать ленты.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--prefix', default='seed',
+                            help='Префикс имен создаваемых пользователей.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        self.now = timezone.now()
+        users = self._stage('пользователи', self._users,
+                            options['users'], options['prefix'])
+        groups = self._stage('сообщества', self._groups, options['groups'])
+        # Популярность не зависит от порядка создания.
+        self.rng.shuffle(users)
+        posts = self._stage('посты', self._posts, options['posts'],
+                            users, groups)
+        self._stage('подписки', self._follows, options['follows'], users)
+        self._stage('комментарии', self._comments, options['comments'],
+                    users, posts)
+        self._stage('счетчики', call_command, 'recount_stats',
+                    batch_size=self.batch_size, stdout=self.stdout)
+        self._stage('поиск', call_command, 'rebuild_search',
+                    batch_size=self.batch_size, stdout=self.stdout)
+        self._stage('ленты', timeline.rebuild, self.rng.sample(
+            users, min(options['timeline_users'], len(users))))
+        pagecache.bump(pagecache.SITE)
+
+    def _stage(self, name, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {time.perf_counter() - start:.1f} с'))
+        return result
+
+    def _batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def _users(self, count, prefix):
+        existing = User.objects.filter(username__startswith=prefix)
+        offset = existing.count()
+        password = make_password(None)
+        for start, size in self._batches(count):
+            User.objects.bulk_create(
+                [User(username=f'{prefix}{offset + number}',
+                      password=password)
+                 for number in range(start, start + size)])
+        return list(existing.order_by('pk').values_list('pk', flat=True))
+
+    def _groups(self, count):
+        offset = Group.objects.count()
+        Group.objects.bulk_create(
+            [Group(title=f'Сообщество {number}', slug=f'group-{number}',
+                   description='Тестовое сообщество')
+             for number in range(offset, offset + count)])
+        return list(Group.objects.values_list('pk', flat=True))
+
+    def _text(self):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(5, 40)))
+
+    def _posts(self, count, users, groups):
+        """ Авторы выбираются по Ципфу, даты равномерно за год. """
+        weights = list(accumulate(zipf_weights(len(users), self.skew)))
+        step = HISTORY / max(count, 1)
+        last_pk = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        pub_date = Post._meta.get_field('pub_date')
+        with explicit_dates(pub_date):
+            for start, size in self._batches(count):
+                authors = self.rng.choices(users, cum_weights=weights,
+                                           k=size)
+                with transaction.atomic():
+                    Post.objects.bulk_create([Post(
+                        text=self._text(), author_id=author_id,
+                        group_id=(self.rng.choice(groups)
+                                  if groups and self.rng.random() < 0.3
+                                  else None),
+                        pub_date=self.now - HISTORY + step * (start + number),
+                    ) for number, author_id in enumerate(authors)])
+        return list(Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', 'pub_date'))
+
+    def _follows(self, count, users):
+        """ Число подписчиков автора убывает по степенному закону. """
+        counts = distribute(count, zipf_weights(len(users), self.skew),
+                            len(users) - 1)
+        batch = []
+        for author_id, followers in zip(users, counts):
+            sample = self.rng.sample(users, min(followers + 1, len(users)))
+            batch += [Follow(user_id=user_id, author_id=author_id)
+                      for user_id in sample[:followers + 1]
+                      if user_id != author_id][:followers]
+            if len(batch) >= self.batch_size:
+                Follow.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Follow.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def _comments(self, count, users, posts):
+        """ Обсуждение сосредоточено на немногих популярных постах. """
+        if not posts:
+            return
+        ranked = self.rng.sample(posts, len(posts))
+        weights = list(accumulate(zipf_weights(len(ranked), self.skew)))
+        created = Comment._meta.get_field('created')
+        with explicit_dates(created):
+            for _, size in self._batches(count):
+                chosen = self.rng.choices(ranked, cum_weights=weights, k=size)
+                with transaction.atomic():
+                    Comment.objects.bulk_create([Comment(
+                        post_id=post_id, text=self._text(),
+                        author_id=self.rng.choice(users),
+                        created=min(self.now, pub_date + timedelta(
+                            hours=self.rng.expovariate(1 / 24))),
+                    ) for post_id, pub_date in chosen])
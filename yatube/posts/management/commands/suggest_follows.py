@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает подсказки, на кого подписаться.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int,
+                            help='Сколько подсказок хранить на пользователя.')
+        parser.add_argument('--block-size', type=int,
+                            help='Сколько пользователей считать за раз.')
+        parser.add_argument('--python', action='store_true',
+                            help='Считать без NumPy и SciPy (только для '
+                                 'небольших баз).')
+
+    def handle(self, *args, **options):
+        if suggestions.sparse is None and not options['python']:
+            self.stderr.write('NumPy и SciPy не установлены, подсказки '
+                              'считаются на Python: это годится только '
+                              'для небольших баз.')
+        result = suggestions.rebuild(
+            options['top_k'], options['block_size'],
+            use_scipy=False if options['python'] else None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Подсказок: {result["suggestions"]}, '
+            f'пользователей: {result["users"]} ({result["engine"]})'))
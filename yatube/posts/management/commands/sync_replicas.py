@@ -0,0 +1,62 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_database(source, target):
+    """ Копируем SQLite-базу через backup API: копия согласована, даже
+    если в источник в это время пишут. """
+    source.backup(target)
+    return target
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в реплики из DATABASE_REPLICAS. '
+            'Без --once работает постоянно и применяет снимки с задержкой '
+            '--lag, имитируя отставание реплик.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag', type=float, default=settings.REPLICA_LAG,
+                            help='Отставание реплик, секунды.')
+        parser.add_argument('--once', action='store_true',
+                            help='Скопировать один раз и выйти.')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплик нет: задайте REPLICA_COUNT.')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite.')
+        source = sqlite3.connect(primary.settings_dict['NAME'])
+        try:
+            if options['once']:
+                self._apply(source)
+                return
+            # Снимок применяется через lag секунд после того, как снят,
+            # поэтому реплики все время видят базу такой, какой она была
+            # lag секунд назад.
+            pending = copy_database(source, sqlite3.connect(':memory:'))
+            while True:
+                time.sleep(options['lag'])
+                fresh = copy_database(source, sqlite3.connect(':memory:'))
+                self._apply(pending)
+                pending.close()
+                pending = fresh
+        except KeyboardInterrupt:
+            pass
+        finally:
+            source.close()
+
+    def _apply(self, snapshot):
+        for alias in settings.DATABASE_REPLICAS:
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                copy_database(snapshot, target)
+            finally:
+                target.close()
+        self.stdout.write(
+            f'{time.strftime("%H:%M:%S")} реплики обновлены: '
+            f'{", ".join(settings.DATABASE_REPLICAS)}')
@@ -0,0 +1,90 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDERS = re.compile(r'\((?:%s, )*%s\)')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """ Приводим SQL к виду, одинаковому для запросов с разными
+    параметрами и разной длиной списков ``IN (...)``. """
+    return SPACES.sub(' ', PLACEHOLDERS.sub('(...)', sql)).strip()
+
+
+class QueryRecorder:
+    """ Создаем счетчик запросов ко всем подключениям к базе.
+
+    Используется как контекстный менеджер: внутри блока каждый запрос
+    учитывается в ``count``, ``duration`` и ``fingerprints``.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(
+                connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def repeated(self, threshold=None):
+        """ Запросы, повторившиеся не меньше ``threshold`` раз. """
+        threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+        return {sql: times for sql, times in self.fingerprints.items()
+                if times >= threshold}
+
+
+class QueryBudgetMiddleware:
+    """ Считаем запросы каждого ответа и предупреждаем о N+1.
+
+    Превышение ``QUERY_BUDGETS`` для имени URL и повторяющиеся запросы
+    пишутся в лог. При ``QUERY_STATS_HEADER = True`` статистика
+    отдается в заголовках ``X-Query-*``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        request.query_stats = recorder
+        match = request.resolver_match
+        name = match.url_name if match else None
+        budget = settings.QUERY_BUDGETS.get(name)
+        if budget is not None and recorder.count > budget:
+            logger.warning('%s: %s запросов при бюджете %s',
+                           request.path, recorder.count, budget)
+        repeated = recorder.repeated()
+        for sql, times in repeated.items():
+            logger.warning('%s: запрос повторился %s раз: %s',
+                           request.path, times, sql)
+        if settings.QUERY_STATS_HEADER:
+            response['X-Query-Count'] = recorder.count
+            response['X-Query-Time'] = '%.1f' % (recorder.duration * 1000)
+            response['X-Query-Repeats'] = len(repeated)
+        return response
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_timeline'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE posts_post_fts "
+                "USING fts5(text, tokenize='unicode61')",
+                "CREATE VIRTUAL TABLE posts_comment_fts "
+                "USING fts5(text, post_id UNINDEXED, tokenize='unicode61')",
+                "INSERT INTO posts_post_fts(rowid, text) "
+                "SELECT id, text FROM posts_post",
+                "INSERT INTO posts_comment_fts(rowid, text, post_id) "
+                "SELECT id, text, post_id FROM posts_comment",
+            ],
+            reverse_sql=[
+                "DROP TABLE posts_comment_fts",
+                "DROP TABLE posts_post_fts",
+            ],
+        ),
+    ]
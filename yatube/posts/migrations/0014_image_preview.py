@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:39
+
+import base64
+from io import BytesIO
+
+from django.db import migrations, models
+from PIL import Image
+
+
+def make_preview(file):
+    # Копия логики превью на момент миграции: код приложения меняется,
+    # а миграция должна работать так же, как в день написания.
+    image = Image.open(file).convert('RGB')
+    image.thumbnail((16, 16), Image.LANCZOS)
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        output.getvalue()).decode()
+
+
+def fill_previews(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    images = Post.objects.exclude(image='').exclude(image=None)
+    for post in images.only('image').iterator():
+        try:
+            with post.image.open('rb') as file:
+                preview = make_preview(file)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            continue
+        Post.objects.filter(pk=post.pk).update(image_preview=preview)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_preview',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_previews, migrations.RunPython.noop),
+    ]
@@ -1,26 +1,80 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage, validate_image_pixels
+
 User = get_user_model()
 
+FEED_FIELDS = ('text', 'pub_date', 'image', 'image_preview',
+               'comment_count', 'version',
+               'author', 'author__username',
+               'group', 'group__title', 'group__slug')
+
+# Меняются только атомарными UPDATE из ``posts.counters``.
+COUNTER_FIELDS = ('comment_count', 'version')
+
+
+class PostQuerySet(models.QuerySet):
+    """ Создаем выборки постов для лент. """
+
+    def for_feed(self):
+        """ Посты для ``post_item.html``: автор и сообщество приходят
+        тем же запросом, неиспользуемые колонки не читаются, а число
+        комментариев берется из ``comment_count``. """
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
 
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    # Отдельные индексы по внешним ключам покрываются составными ниже.
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name="posts")
+                               related_name="posts", db_index=False)
     group = models.ForeignKey("Group", on_delete=models.SET_NULL, blank=True,
-                              null=True, related_name="group")
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+                              null=True, related_name="group",
+                              db_index=False)
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              storage=ContentAddressedStorage(),
+                              validators=[validate_image_pixels])
+    image_preview = models.TextField(blank=True, default='', editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         """ Создаем класс для сортировки по умолчанию. """
 
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """ Сохранение загруженного поста не пишет счетчики.
+
+        Значения ``COUNTER_FIELDS``, прочитанные в начале запроса, к
+        моменту сохранения могли устареть: полное сохранение затерло бы
+        новый комментарий или версию карточки.
+        """
+        if (update_fields is None and not force_insert
+                and not self._state.adding):
+            deferred = self.get_deferred_fields()
+            update_fields = [field.name for field
+                             in self._meta.concrete_fields
+                             if not field.primary_key
+                             and field.attname not in deferred
+                             and field.name not in COUNTER_FIELDS]
+        super().save(force_insert, force_update, using, update_fields)
+
 
 class Group(models.Model):
     """ Создаем модель для сообществ. """
@@ -37,11 +91,15 @@ class Group(models.Model):
 class Comment(models.Model):
     """ Создаем модель для комментария. """
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
-                             related_name='comments')
+                             related_name='comments', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['post', 'created', 'id'],
+                                name='comment_thread_idx')]
+
     def __str__(self):
         return self.text
 
@@ -49,13 +107,87 @@ class Comment(models.Model):
 class Follow(models.Model):
     """ Создаем модель для подписок. """
     user = models.ForeignKey(User, on_delete=models.CASCADE,
-                             related_name="follower")
+                             related_name="follower", db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name="following")
+                               related_name="following", db_index=False)
 
     class Meta:
         constraints = [models.UniqueConstraint(fields=['user', 'author'],
                                                name='unique_followers')]
+        indexes = [
+            models.Index(fields=['author', '-id'],
+                         name='follow_followers_idx'),
+            models.Index(fields=['user', '-id'],
+                         name='follow_following_idx'),
+        ]
 
     def __str__(self):
         return str(self.author)
+
+
+class Suggestion(models.Model):
+    """ Создаем модель для подсказок, на кого подписаться.
+
+    Таблицу пересчитывает команда ``suggest_follows`` из графа подписок,
+    страницы ее только читают. ``rank`` — место в подсказках
+    пользователя, ``score`` — число его подписок, подписанных на автора.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="suggestions", db_index=False)
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'rank'],
+                                               name='unique_suggestion_rank')]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class UserStats(models.Model):
+    """ Создаем модель для счетчиков пользователя.
+
+    Счетчики обновляются сигналами из ``posts.signals`` в той же
+    транзакции, что и сама запись. Разошедшиеся значения пересчитывает
+    команда ``recount_stats``.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="stats")
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """ Создаем модель для материализованной ленты подписок.
+
+    Строки раскладываются по подписчикам при публикации поста
+    (см. ``posts.timeline``), поэтому лента читается одним диапазоном
+    по индексу ``(user, pub_date, post)``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'post'],
+                                               name='unique_timeline_post')]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_feed_idx'),
+            models.Index(fields=['user', 'author', '-pub_date'],
+                         name='timeline_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.post_id}'
@@ -0,0 +1,257 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import caching
+
+SITE = 'site'
+
+STATS_KEYS = {'hits': 'page-cache-stats:hits',
+              'misses': 'page-cache-stats:misses'}
+
+
+def _generation_key(namespace):
+    return f'page-generation:{namespace}'
+
+
+def _fresh_generation():
+    # Пропавший из кеша счетчик начинается с текущего времени, чтобы
+    # не совпасть ни с одним из старых значений.
+    return int(time.time() * 1000)
+
+
+def generations(namespaces):
+    """ Текущие поколения лент, недостающие создаются. """
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh_generation(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*namespaces):
+    """ Сдвигаем поколения: все закешированные страницы этих лент
+    перестают находиться, ничего перебирать не нужно.
+
+    Поколение растет хотя бы на единицу и не отстает от текущего времени
+    в миллисекундах, поэтому оно же служит временем последней правки
+    ленты для ``Last-Modified``. Атомарный ``incr`` не теряет сдвигов
+    при одновременных правках.
+    """
+    now = _fresh_generation()
+    for namespace in namespaces:
+        key = _generation_key(namespace)
+        current = cache.get(key)
+        try:
+            if current is None:
+                raise ValueError(key)
+            cache.incr(key, max(now - current, 1))
+        except ValueError:
+            cache.set(key, now, None)
+
+
+def _current(request, namespaces, kwargs):
+    """ Поколения лент представления, один раз на запрос. """
+    names = tuple([SITE] + [namespace.format(**kwargs)
+                            for namespace in namespaces])
+    known = request.__dict__.setdefault('_page_generations', {})
+    if names not in known:
+        known[names] = generations(names)
+    return known[names]
+
+
+def settled(current):
+    """ Страница из поколений ``current`` не старше задержки реплик.
+
+    Страницу, собранную с реплики сразу после правки, нельзя запоминать
+    под новым поколением: реплика могла еще не увидеть правку.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return True
+    return _fresh_generation() - max(current) >= settings.REPLICA_LAG * 1000
+
+
+def page_etag(request, parts):
+    """ ETag страницы: путь, cookie сессии и CSRF и ``parts``.
+
+    От сессии зависят пользователь, меню и кнопки, от CSRF-cookie — токен
+    в формах. Берутся сами cookie, а не ``request.user``, чтобы ответ 304
+    не загружал сессию и пользователя из базы.
+    """
+    stamp = '|'.join(str(part) for part in [
+        request.get_full_path(),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')] + list(parts))
+    return quote_etag(hashlib.md5(stamp.encode()).hexdigest())
+
+
+def conditional(request, etag, last_modified=None):
+    """ Ответ 304, если условный запрос совпал с валидаторами. """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(request, etag=etag,
+                                    last_modified=last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    """ Отдаем валидаторы вместе с ответом 200 или 304. """
+    if response.status_code in (200, 304):
+        response.setdefault('ETag', etag)
+        if last_modified is not None:
+            response.setdefault('Last-Modified', http_date(last_modified))
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _viewer_key(session_key):
+    return f'page-viewer:{session_key}'
+
+
+def viewer_of(request):
+    """ id пользователя по cookie сессии, не загружая сессию.
+
+    0 — гость, None — cookie еще не встречалась: страницу нужно
+    собрать, а ``remember_viewer`` запомнит пользователя.
+    """
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return 0
+    return cache.get(_viewer_key(session_key))
+
+
+def remember_viewer(request):
+    """ Запоминаем пользователя cookie сессии после рендера. """
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return 0
+    user = request.user
+    viewer = user.pk if user.is_authenticated else 0
+    cache.set(_viewer_key(session_key), viewer, settings.SESSION_COOKIE_AGE)
+    return viewer
+
+
+def conditional_page(*namespaces, viewer=()):
+    """ Отвечаем 304 Not Modified без рендера, если страница не менялась.
+
+    Валидаторы строятся из поколений лент ``namespaces`` (как в
+    ``anonymous_cache``) и не требуют запросов к базе: ETag — из
+    поколений и пользователя, ``Last-Modified`` — самое свежее
+    поколение, то есть время последней правки. Ленты ``viewer``
+    (например, ``'suggestions:{viewer}'``) добавляются только для
+    вошедших пользователей; пока пользователь cookie сессии неизвестен,
+    страница отдается без валидаторов. Работает для всех
+    пользователей; ставится снаружи ``anonymous_cache``. Пока правка
+    моложе ``REPLICA_LAG``, валидаторы не выдаются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            current = _current(request, namespaces, kwargs)
+            viewer_id = viewer_of(request) if viewer else 0
+            if viewer_id is None:
+                response = view(request, *args, **kwargs)
+                remember_viewer(request)
+                return response
+            if viewer_id:
+                current = current + _current(request, viewer,
+                                             {'viewer': viewer_id})
+            if not settled(current):
+                return view(request, *args, **kwargs)
+            etag = page_etag(request, current)
+            last_modified = max(current) // 1000
+            response = conditional(request, etag, last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return add_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def post_namespaces(post):
+    """ Ленты, на которых виден пост. """
+    namespaces = ['index', f'author:{post.author.username}',
+                  f'post:{post.pk}']
+    if post.group_id:
+        namespaces.append(f'group:{post.group.slug}')
+    return namespaces
+
+
+def _count(name):
+    key = STATS_KEYS[name]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    """ Число попаданий и промахов кеша страниц. """
+    found = cache.get_many(STATS_KEYS.values())
+    hits = found.get(STATS_KEYS['hits'], 0)
+    misses = found.get(STATS_KEYS['misses'], 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses,
+            'hit_ratio': hits / total if total else 0.0}
+
+
+def anonymous_cache(*namespaces):
+    """ Кешируем ответ представления для анонимных GET-запросов.
+
+    Ключ строится из пути, строки запроса и поколений лент
+    ``namespaces``; в шаблонах имен подставляются аргументы
+    представления, например ``'post:{post_id}'``. Поколение ``SITE``
+    входит в ключ всегда и сдвигается при редких правках, видных на
+    многих страницах: переименовании сообщества или пользователя.
+    Авторизованные пользователи всегда получают свежую страницу. Пока
+    правка моложе ``REPLICA_LAG``, страница не кешируется. Промах
+    заполняет ``caching.get_or_set``: горячую страницу рендерит один
+    воркер, остальные ждут его результата.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (not settings.ANONYMOUS_PAGE_CACHE
+                    or request.method != 'GET'
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            current = _current(request, namespaces, kwargs)
+            digest = hashlib.md5(
+                request.get_full_path().encode()).hexdigest()
+            key = 'anonymous-page:%s:%s' % (
+                digest, ':'.join(str(number) for number in current))
+            rendered = []
+
+            def render():
+                response = view(request, *args, **kwargs)
+                rendered.append(response)
+                if (response.status_code == 200 and not response.streaming
+                        and settled(current)):
+                    return response.content, response['Content-Type']
+                return None
+
+            cached = caching.get_or_set(
+                key, render, settings.ANONYMOUS_PAGE_CACHE_TIMEOUT)
+            if rendered:
+                _count('misses')
+                response = rendered[0]
+                response['X-Page-Cache'] = 'miss'
+            else:
+                _count('hits')
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'hit'
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,222 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import DateTimeField, Q
+from django.utils.dateparse import parse_datetime
+
+PAGE_LINKS_WINDOW = 2
+
+
+def encode_cursor(values, number, before=False):
+    """ Упаковываем позицию ленты в непрозрачный токен. """
+    payload = json.dumps({'k': values, 'n': number, 'b': int(before)},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """ Распаковываем токен, для битого токена возвращаем None. """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload['k'], int(payload['n']), bool(payload['b'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """ Паджинатор по ключу сортировки вместо OFFSET.
+
+    Позиция страницы хранится в токене, а не в номере, поэтому любая
+    страница стоит одинаково. COUNT выполняется только при обращении
+    к ``count``; ``num_pages`` возвращает последнюю страницу, известную
+    по окну ссылок, и не ходит в базу.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 window=PAGE_LINKS_WINDOW):
+        self.ordering = ordering
+        self.window = window
+        self.keys = [(name.lstrip('-'), name.startswith('-'))
+                     for name in ordering]
+        self.last_known_page = 1
+        super().__init__(object_list.order_by(*ordering), per_page)
+
+    @property
+    def num_pages(self):
+        return self.last_known_page
+
+    def _field(self, name):
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _dump(self, values):
+        return [value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in values]
+
+    def _checked(self, values):
+        """ Ключ из токена: список ровно по числу ключей сортировки. """
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise ValueError('Ключ токена не совпадает с сортировкой')
+        return values
+
+    def _load(self, values):
+        loaded = []
+        for (name, _), value in zip(self.keys, self._checked(values)):
+            if isinstance(self._field(name), DateTimeField):
+                value = parse_datetime(value)
+            loaded.append(value)
+        return loaded
+
+    def _key_of(self, obj):
+        return [getattr(obj, 'pk' if name == 'pk'
+                        else self._field(name).attname)
+                for name, _ in self.keys]
+
+    def _seek(self, values, before=False):
+        """ Строки строго после (или до) позиции в порядке ленты. """
+        condition = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending != before else 'gt'
+            bound = {key: value for (key, _), value
+                     in zip(self.keys[:index], values)}
+            bound['%s__%s' % (name, lookup)] = values[index]
+            condition |= Q(**bound)
+        # Нестрогая граница по первому ключу повторяет условие, но дает
+        # базе диапазон по индексу вместо перебора с сортировкой.
+        name, descending = self.keys[0]
+        lookup = 'lte' if descending != before else 'gte'
+        queryset = self.object_list.filter(
+            condition, **{'%s__%s' % (name, lookup): values[0]})
+        if before:
+            queryset = queryset.reverse()
+        return queryset
+
+    def _cursor(self, values, number, before=False):
+        return encode_cursor(self._dump(values), number, before)
+
+    def fetch_rows(self, values=None, before=False, offset=0):
+        """ Строки страницы после позиции ``values`` (или с начала).
+
+        Вместе с ``fetch_keys`` и ``_key_of`` это точки расширения для
+        паджинаторов, которые читают строки не из QuerySet.
+        """
+        queryset = (self.object_list if values is None
+                    else self._seek(values, before))
+        return list(queryset[offset:offset + self.per_page])
+
+    def fetch_keys(self, values, before, limit):
+        """ Ключи сортировки строк после (или до) позиции ``values``. """
+        names = [name for name, _ in self.keys]
+        return list(self._seek(values, before).values_list(*names)[:limit])
+
+    def _load_rows(self, cursor, page_number):
+        """ Достаем строки страницы и ее номер по токену или номеру. """
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None:
+            values, number, before = position
+            try:
+                rows = self.fetch_rows(self._load(values), before)
+            except (IndexError, TypeError, ValueError):
+                return self._first_rows()
+            if before:
+                rows.reverse()
+            if len(rows) < self.per_page and (before or not rows):
+                return self._first_rows()
+            return rows, max(number, 1)
+        try:
+            number = max(int(page_number), 1)
+        except (TypeError, ValueError):
+            return self._first_rows()
+        rows = self.fetch_rows(offset=(number - 1) * self.per_page)
+        if not rows:
+            return self._first_rows()
+        return rows, number
+
+    def _first_rows(self):
+        return self.fetch_rows(), 1
+
+    def get_page(self, cursor=None, page_number=None):
+        """ Возвращаем страницу по токену ``cursor``.
+
+        ``page_number`` оставлен для старых ссылок вида ``?page=N``:
+        он читается через OFFSET, но дальше навигация идет по токенам.
+        """
+        rows, number = self._load_rows(cursor, page_number)
+        if not rows:
+            return self._page(rows, 1, None, None, ())
+        first, last = self._key_of(rows[0]), self._key_of(rows[-1])
+        ahead = self.fetch_keys(last, False,
+                                self.per_page * (self.window - 1) + 1)
+        behind = []
+        if number > 1:
+            behind = self.fetch_keys(first, True,
+                                     self.per_page * self.window + 1)
+        if len(behind) <= self.per_page * self.window:
+            number = -(-len(behind) // self.per_page) + 1
+        else:
+            number = max(number, self.window + 1)
+
+        links = []
+        for step in range(min(self.window, number - 1), 0, -1):
+            edge = (step - 1) * self.per_page
+            anchor = list(behind[edge - 1]) if edge else first
+            token = None
+            if len(behind) > step * self.per_page:
+                token = self._cursor(anchor, number - step, before=True)
+            links.append({'number': number - step, 'cursor': token})
+        links.append({'number': number, 'cursor': None, 'current': True})
+        for step in range(1, self.window + 1):
+            edge = (step - 1) * self.per_page
+            if len(ahead) <= edge:
+                break
+            anchor = list(ahead[edge - 1]) if edge else last
+            links.append({'number': number + step,
+                          'cursor': self._cursor(anchor, number + step)})
+
+        previous_cursor = next((link['cursor'] for link in links
+                                if link['number'] == number - 1), None)
+        next_cursor = self._cursor(last, number + 1) if ahead else None
+        return self._page(rows, number, previous_cursor, next_cursor, links)
+
+    def _page(self, rows, number, previous_cursor, next_cursor, links):
+        self.last_known_page = links[-1]['number'] if links else number
+        page = self._get_page(rows, number, self)
+        page.previous_cursor = previous_cursor
+        page.next_cursor = next_cursor
+        page.page_links = links
+        return page
+
+
+class ValuesCursorPaginator(CursorPaginator):
+    """ Паджинатор по ключу для выборок ``values()``: строки — словари,
+    ключи сортировки должны входить в выборку. """
+
+    def _key_of(self, row):
+        return [row[name] for name, _ in self.keys]
+
+
+def get_page(request, paginator):
+    """ Создаем страницу по параметрам запроса.
+
+    ``page.query`` хранит остальные GET-параметры, чтобы ссылки
+    паджинатора их не теряли.
+    """
+    page = paginator.get_page(request.GET.get('cursor'),
+                              request.GET.get('page'))
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('page', None)
+    page.query = params.urlencode()
+    return page
+
+
+def paginate(request, queryset, per_page=None,
+             paginator_class=CursorPaginator, **kwargs):
+    """ Создаем страницу ленты по параметрам запроса. """
+    paginator = paginator_class(queryset, per_page or settings.PAG_VAL,
+                                **kwargs)
+    return get_page(request, paginator)
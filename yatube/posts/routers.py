@@ -0,0 +1,100 @@
+import math
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def _pinned():
+    return getattr(_state, 'primary', False)
+
+
+def pin_primary():
+    """ Дальше в этом запросе (или потоке) читаем с основной базы. """
+    _state.primary = True
+
+
+def _replica(replicas):
+    """ Одна реплика на запрос (или поток): все чтения страницы видят
+    одно и то же состояние базы. """
+    replica = getattr(_state, 'replica', None)
+    if replica not in replicas:
+        replica = _state.replica = random.choice(replicas)
+    return replica
+
+
+def use_primary(view):
+    """ Представление целиком работает с основной базой.
+
+    Для представлений, которые пишут: их чтения не должны отставать
+    от только что сделанных записей.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        pin_primary()
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """ Чтения идут на реплику из ``DATABASE_REPLICAS``, выбранную
+    на запрос, записи — в основную базу.
+
+    После первой записи поток закрепляется за основной базой, внутри
+    транзакции основной базы чтения тоже идут в нее. Без реплик роутер
+    ничего не меняет.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or _pinned()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return _replica(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, объекты из них совместимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """ Read-your-writes: кто только что писал, читает с основной базы.
+
+    Небезопасные методы целиком идут в основную базу. После запроса
+    с записью ставится cookie ``REPLICA_PIN_COOKIE`` на ``REPLICA_LAG``
+    секунд, и пока она жива, чтения этого клиента тоже идут в основную
+    базу — реплики успевают догнать ее.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.primary = (request.method not in self.SAFE_METHODS
+                          or settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        _state.wrote = False
+        _state.replica = None
+        try:
+            response = self.get_response(request)
+            if _state.wrote and settings.DATABASE_REPLICAS:
+                response.set_cookie(settings.REPLICA_PIN_COOKIE, '1',
+                                    max_age=math.ceil(settings.REPLICA_LAG),
+                                    httponly=True)
+        finally:
+            _state.primary = _state.wrote = False
+            _state.replica = None
+        return response
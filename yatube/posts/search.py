@@ -0,0 +1,154 @@
+import re
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+from .models import Comment, Post
+from .paginator import CursorPaginator
+
+COMMENT_WEIGHT = 0.5
+
+TERMS = re.compile(r'\w+')
+
+RESULTS_SQL = '''
+    SELECT post_id, MIN(score) FROM (
+        SELECT rowid AS post_id, bm25(posts_post_fts) AS score
+        FROM posts_post_fts WHERE posts_post_fts MATCH %s
+        UNION ALL
+        SELECT post_id, bm25(posts_comment_fts) * {weight} AS score
+        FROM posts_comment_fts WHERE posts_comment_fts MATCH %s
+    )
+    GROUP BY post_id
+    {having}
+    ORDER BY MIN(score) {direction}, post_id {direction}
+    LIMIT %s OFFSET %s
+'''
+
+COUNT_SQL = '''
+    SELECT COUNT(*) FROM (
+        SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s
+        UNION
+        SELECT post_id FROM posts_comment_fts
+        WHERE posts_comment_fts MATCH %s
+    )
+'''
+
+
+def to_match(phrase):
+    """ Превращаем ввод пользователя в безопасный запрос FTS5: каждое
+    слово берется в кавычки, последнее ищется по префиксу. """
+    terms = ['"%s"' % term for term in TERMS.findall(phrase)]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _execute(model, sql, params, write=False):
+    alias = (router.db_for_write(model) if write
+             else router.db_for_read(model))
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall() if not write else None
+
+
+def index_post(post):
+    _execute(Post, 'INSERT OR REPLACE INTO posts_post_fts(rowid, text) '
+                   'VALUES (%s, %s)', [post.pk, post.text], write=True)
+
+
+def unindex_post(post_id):
+    _execute(Post, 'DELETE FROM posts_post_fts WHERE rowid = %s',
+             [post_id], write=True)
+
+
+def index_comment(comment):
+    _execute(Comment, 'INSERT OR REPLACE INTO '
+                      'posts_comment_fts(rowid, text, post_id) '
+                      'VALUES (%s, %s, %s)',
+             [comment.pk, comment.text, comment.post_id], write=True)
+
+
+def unindex_comment(comment_id):
+    _execute(Comment, 'DELETE FROM posts_comment_fts WHERE rowid = %s',
+             [comment_id], write=True)
+
+
+def rebuild_index(batch_size=5000):
+    """ Перестраиваем индекс целиком пачками по диапазонам id. """
+    total = 0
+    for model, table, fields in ((Post, 'posts_post_fts', 'text'),
+                                 (Comment, 'posts_comment_fts',
+                                  'text, post_id')):
+        _execute(model, f'DELETE FROM {table}', [], write=True)
+        last_pk = 0
+        while True:
+            pks = list(model.objects.filter(pk__gt=last_pk).order_by('pk')
+                       .values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            _execute(model,
+                     f'INSERT INTO {table}(rowid, {fields}) '
+                     f'SELECT id, {fields} FROM {model._meta.db_table} '
+                     f'WHERE id BETWEEN %s AND %s',
+                     [pks[0], pks[-1]], write=True)
+            total += len(pks)
+            last_pk = pks[-1]
+        _execute(model, f"INSERT INTO {table}({table}) VALUES ('optimize')",
+                 [], write=True)
+    return total
+
+
+def matching_posts(phrase):
+    """ Условие для ``pk__in``: посты, в тексте которых есть фраза. """
+    return RawSQL('SELECT rowid FROM posts_post_fts '
+                  'WHERE posts_post_fts MATCH %s', [to_match(phrase)])
+
+
+class SearchPaginator(CursorPaginator):
+    """ Паджинатор результатов поиска по ключу ``(score, id)``.
+
+    ``score`` — лучший ранг bm25 по тексту поста и его комментариям,
+    совпадения в комментариях весят меньше.
+    """
+
+    def __init__(self, phrase, per_page, **kwargs):
+        self.match = to_match(phrase)
+        super().__init__(Post.objects.for_feed(), per_page,
+                         ordering=('score', 'pk'), **kwargs)
+
+    @cached_property
+    def count(self):
+        return _execute(Post, COUNT_SQL, [self.match, self.match])[0][0]
+
+    def _load(self, values):
+        score, pk = self._checked(values)
+        return [float(score), int(pk)]
+
+    def _key_of(self, obj):
+        return [obj.score, obj.pk]
+
+    def _ranked(self, values, before, limit, offset=0):
+        having, params = '', [self.match, self.match]
+        if values is not None:
+            sign = '<' if before else '>'
+            having = (f'HAVING MIN(score) {sign} %s '
+                      f'OR (MIN(score) = %s AND post_id {sign} %s)')
+            params += [values[0], values[0], values[1]]
+        sql = RESULTS_SQL.format(weight=COMMENT_WEIGHT, having=having,
+                                 direction='DESC' if before else 'ASC')
+        return _execute(Post, sql, params + [limit, offset])
+
+    def fetch_rows(self, values=None, before=False, offset=0):
+        ranked = self._ranked(values, before, self.per_page, offset)
+        posts = self.object_list.in_bulk([pk for pk, _ in ranked])
+        rows = []
+        for pk, score in ranked:
+            if pk in posts:
+                posts[pk].score = score
+                rows.append(posts[pk])
+        return rows
+
+    def fetch_keys(self, values, before, limit):
+        return [(score, pk) for pk, score
+                in self._ranked(values, before, limit)]
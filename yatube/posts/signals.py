@@ -0,0 +1,137 @@
+import threading
+
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import follows, pagecache, search, suggestions, timeline
+from .counters import (bump_comment_count, bump_post_version,
+                       bump_user_stats)
+from .models import Comment, Follow, Group, Post, User
+
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+# Посты, которые сейчас удаляются: их комментарии уходят каскадом,
+# и ленты сбросит удаление самого поста.
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._loaded_names = tuple(
+        instance.__dict__.get(field) for field in USER_DISPLAY_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    names = tuple(getattr(instance, field) for field in USER_DISPLAY_FIELDS)
+    if not created and names != instance._loaded_names:
+        pagecache.bump(pagecache.SITE)
+    instance._loaded_names = names
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    pagecache.bump(pagecache.SITE)
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # Запоминаем сообщество без обращения к отложенным полям, чтобы при
+    # переносе поста сбросить страницу и старого сообщества.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(pre_save, sender=Post)
+def post_image_preview(sender, instance, raw=False, **kwargs):
+    # Превью считается один раз, при загрузке нового файла. Файл
+    # сохраняется здесь, а не в ``FileField.pre_save``: хранилище
+    # распаковывает загрузку один раз и заодно считает превью.
+    if raw or 'image' not in instance.__dict__:
+        return
+    if not instance.image:
+        instance.image_preview = ''
+    elif not instance.image._committed:
+        upload = instance.image.file
+        instance.image.save(instance.image.name, upload, save=False)
+        instance.image_preview = getattr(upload, 'image_preview', '')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    search.index_post(instance)
+    pagecache.bump(*pagecache.post_namespaces(instance))
+    old_group_id = instance._loaded_group_id
+    if old_group_id and old_group_id != instance.group_id:
+        pagecache.bump(*(f'group:{slug}' for slug in Group.objects.filter(
+            pk=old_group_id).values_list('slug', flat=True)))
+    instance._loaded_group_id = instance.group_id
+    if created and not raw:
+        bump_user_stats(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+    elif not created:
+        bump_post_version(instance.pk)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    search.unindex_post(instance.pk)
+    pagecache.bump(*pagecache.post_namespaces(instance))
+    bump_user_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    search.index_comment(instance)
+    pagecache.bump(*pagecache.post_namespaces(instance.post))
+    if created and not raw:
+        bump_comment_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    search.unindex_comment(instance.pk)
+    if instance.post_id in _deleting_posts():
+        return
+    post = (Post.objects.filter(pk=instance.post_id)
+            .select_related('author', 'group')
+            .only('author__username', 'group__slug').first())
+    if post is None:
+        return
+    pagecache.bump(*pagecache.post_namespaces(post))
+    bump_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    pagecache.bump(f'author:{instance.user.username}',
+                   f'author:{instance.author.username}')
+    if created and not raw:
+        bump_user_stats(instance.user_id, following_count=1)
+        bump_user_stats(instance.author_id, followers_count=1)
+        follows.forget(instance.user_id)
+        suggestions.forget(instance.user_id, [instance.author_id])
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    pagecache.bump(f'author:{instance.user.username}',
+                   f'author:{instance.author.username}')
+    bump_user_stats(instance.user_id, following_count=-1)
+    bump_user_stats(instance.author_id, followers_count=-1)
+    follows.forget(instance.user_id)
+    timeline.prune(instance.user_id, instance.author_id)
@@ -0,0 +1,110 @@
+import logging
+import random
+import sqlite3
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+# Ожидание BEGIN IMMEDIATE дольше этого считается ожиданием блокировки.
+WAIT_THRESHOLD_MS = 1.0
+
+STATS_KEYS = {'transactions': 'sqlite-stats:transactions',
+              'waits': 'sqlite-stats:waits',
+              'wait_ms': 'sqlite-stats:wait_ms',
+              'busy': 'sqlite-stats:busy',
+              'retries': 'sqlite-stats:retries'}
+
+
+def _count(name, value=1):
+    key = STATS_KEYS[name]
+    try:
+        cache.incr(key, value)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, value)
+
+
+def stats():
+    """ Транзакции записи, ожидания блокировки и ошибки SQLITE_BUSY. """
+    found = cache.get_many(STATS_KEYS.values())
+    result = {name: found.get(key, 0) for name, key in STATS_KEYS.items()}
+    result['avg_wait_ms'] = (result['wait_ms'] / result['waits']
+                             if result['waits'] else 0.0)
+    return result
+
+
+def configure(connection):
+    """ Настраиваем новое подключение для нескольких процессов.
+
+    WAL дает читателям снимок базы, поэтому чтения не ждут писателей,
+    а писатели — читателей. ``synchronous=NORMAL`` в режиме WAL не
+    теряет целостность, только последние транзакции при сбое питания.
+    """
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    connection.execute('PRAGMA mmap_size = %d' % settings.SQLITE_MMAP_SIZE)
+    connection.execute(
+        'PRAGMA busy_timeout = %d' % settings.SQLITE_BUSY_TIMEOUT)
+
+
+def is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def begin_immediate(cursor):
+    """ Начинаем транзакцию записи сразу с блокировкой на запись.
+
+    Отложенный BEGIN берет блокировку только на первой записи, и если
+    снимок к тому времени устарел, SQLite отвечает SQLITE_BUSY без
+    ожидания. BEGIN IMMEDIATE ждет блокировку по ``busy_timeout`` еще
+    до первого чтения; время ожидания попадает в статистику.
+    """
+    start = time.perf_counter()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+    except (OperationalError, sqlite3.OperationalError) as error:
+        if is_busy(error):
+            _count('busy')
+        raise
+    finally:
+        waited = (time.perf_counter() - start) * 1000
+        _count('transactions')
+        if waited >= WAIT_THRESHOLD_MS:
+            _count('waits')
+            _count('wait_ms', round(waited))
+
+
+def retry_on_busy(view):
+    """ Повторяем представление, если запись не дождалась блокировки.
+
+    Между попытками пауза растет вдвое от ``SQLITE_RETRY_BACKOFF`` со
+    случайной добавкой, чтобы писатели не просыпались разом. Внутри
+    внешней транзакции повторять нечего, ошибка пробрасывается.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return view(request, *args, **kwargs)
+            except OperationalError as error:
+                if (not is_busy(error)
+                        or attempt >= settings.SQLITE_WRITE_RETRIES
+                        or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+                    raise
+                delay = settings.SQLITE_RETRY_BACKOFF * 2 ** attempt
+                attempt += 1
+                _count('retries')
+                logger.warning('%s: база занята, попытка %s через %.2f с',
+                               request.path, attempt + 1, delay)
+                time.sleep(delay * (1 + random.random()))
+                # Загруженные файлы прочитаны первой попыткой.
+                for upload in request.FILES.values():
+                    upload.seek(0)
+    return wrapper
@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps
+
+FORMATS = {'RGB': ('JPEG', '.jpg'), 'RGBA': ('PNG', '.png')}
+
+PREVIEW_SIZE = 16
+
+
+def _size_of(upload):
+    # Форма уже прочитала заголовок и оставила его в ``upload.image``,
+    # иначе читаем только заголовок, без декодирования пикселей.
+    image = getattr(upload, 'image', None)
+    if image is not None:
+        return image.size
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            return image.size
+    finally:
+        upload.seek(0)
+
+
+def validate_image_pixels(value):
+    """ Отклоняем изображения, которые слишком велики для распаковки. """
+    if not value or getattr(value, '_committed', True):
+        return
+    width, height = _size_of(getattr(value, 'file', value))
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение слишком большое: %(width)s×%(height)s.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height})
+
+
+def _decode(content, limit):
+    content.seek(0)
+    with Image.open(content) as image:
+        if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+            raise ValueError('Изображение слишком большое для распаковки')
+        # JPEG сразу декодируется в уменьшенном масштабе.
+        image.draft('RGB', limit)
+        has_alpha = (image.mode in ('RGBA', 'LA', 'PA')
+                     or 'transparency' in image.info)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    content.seek(0)
+    image.thumbnail(limit, Image.LANCZOS)
+    return image
+
+
+def normalize(content):
+    """ Перекодируем загрузку: поворот по EXIF, уменьшение до
+    ``IMAGE_MAX_SIZE``, RGB или RGBA без метаданных. Возвращаем байты,
+    расширение и превью из той же распакованной картинки. """
+    limit = (settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE)
+    image = _decode(content, limit)
+    image_format, extension = FORMATS[image.mode]
+    output = BytesIO()
+    image.save(output, image_format, quality=settings.IMAGE_QUALITY,
+               optimize=True)
+    return output.getvalue(), extension, preview(image)
+
+
+def preview(image):
+    """ Крошечное превью изображения как data URI для заглушки. """
+    image = image.convert('RGB')
+    image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        output.getvalue()).decode()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """ Создаем хранилище изображений, адресуемых по содержимому.
+
+    Загрузка нормализуется через ``normalize``, имя файла — SHA-256
+    результата, поэтому одинаковые изображения хранятся один раз.
+    Каталог из ``upload_to`` сохраняется. Превью остается в атрибуте
+    ``image_preview`` загрузки.
+    """
+
+    def _save(self, name, content):
+        data, extension, content.image_preview = normalize(content)
+        digest = hashlib.sha256(data).hexdigest()
+        name = os.path.join(os.path.dirname(name), digest[:2], digest[2:4],
+                            digest + extension)
+        if self.exists(name):
+            return name
+        return super()._save(name, ContentFile(data))
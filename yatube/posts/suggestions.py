@@ -0,0 +1,167 @@
+import heapq
+import itertools
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import caching, pagecache
+from .models import Follow, Suggestion
+
+# NumPy и SciPy входят в requirements.txt. Без них приложение все равно
+# загружается, а подсказки считает запасной вариант на Python.
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
+
+# Общая лента сдвигается пересчетом, лента пользователя — его подпиской.
+NAMESPACE = 'suggestions'
+
+READ_CHUNK = 10000
+
+
+def user_namespace(user_id):
+    return f'{NAMESPACE}:{user_id}'
+
+
+def _edges():
+    """ Все подписки парами ``(user_id, author_id)`` потоком. """
+    return (Follow.objects.order_by().values_list('user_id', 'author_id')
+            .iterator(chunk_size=READ_CHUNK))
+
+
+def _blocks(ids, block_size):
+    """ Начало блока и границы его id ``[low, high)``, края открыты. """
+    for start in range(0, len(ids), block_size):
+        end = start + block_size
+        low = int(ids[start]) if start else None
+        high = int(ids[end]) if end < len(ids) else None
+        yield start, low, high
+
+
+def _score_sparse(top_k, block_size):
+    """ Подсказки из разреженной матрицы смежности ``A``.
+
+    Строка ``A @ A`` — сколько подписок пользователя подписаны на
+    каждого автора. Матрица перемножается блоками строк, из блока
+    убираются уже подписанные авторы и сам пользователь, лучшие
+    ``top_k`` в строке выбираются одной сортировкой на блок.
+    """
+    pairs = numpy.fromiter(itertools.chain.from_iterable(_edges()),
+                           dtype=numpy.int64).reshape(-1, 2)
+    ids, index = numpy.unique(pairs, return_inverse=True)
+    index = index.reshape(-1, 2)
+    adjacency = sparse.csr_matrix(
+        (numpy.ones(len(index), dtype=numpy.float32),
+         (index[:, 0], index[:, 1])), shape=(len(ids), len(ids)))
+    for start, low, high in _blocks(ids, block_size):
+        block = adjacency[start:start + block_size]
+        scores = block @ adjacency
+        scores = (scores - scores.multiply(block)).tocoo()
+        keep = (scores.data > 0) & (scores.col != scores.row + start)
+        rows, cols = scores.row[keep], scores.col[keep]
+        data = scores.data[keep]
+        # Порядок как у запасного варианта: очки по убыванию, при
+        # равенстве — меньший id автора (id отсортированы).
+        order = numpy.lexsort((cols, -data, rows))
+        rows, cols, data = rows[order], cols[order], data[order]
+        rank = numpy.arange(len(rows)) - numpy.searchsorted(rows, rows)
+        top = rank < top_k
+        yield low, high, list(zip(ids[rows[top] + start].tolist(),
+                                  ids[cols[top]].tolist(),
+                                  data[top].tolist(), rank[top].tolist()))
+
+
+def _score_python(top_k, block_size):
+    """ Те же подсказки без NumPy: словарь множеств и счетчики.
+
+    Только для небольших баз и тестов: счетчик на каждого пользователя
+    по всем друзьям друзей не уложится в минуты на миллионах подписок.
+    """
+    following = defaultdict(set)
+    for user_id, author_id in _edges():
+        following[user_id].add(author_id)
+    ids = sorted(set(following).union(*following.values()))
+    for start, low, high in _blocks(ids, block_size):
+        rows = []
+        for user_id in ids[start:start + block_size]:
+            followed = following.get(user_id, set())
+            scores = Counter(itertools.chain.from_iterable(
+                following.get(pk, ()) for pk in followed))
+            best = heapq.nsmallest(top_k, (
+                (-score, author_id) for author_id, score in scores.items()
+                if author_id != user_id and author_id not in followed))
+            rows += [(user_id, author_id, float(-score), rank)
+                     for rank, (score, author_id) in enumerate(best)]
+        yield low, high, rows
+
+
+def _store(low, high, rows):
+    """ Заменяем подсказки пользователей с id из ``[low, high)``. """
+    stale = Suggestion.objects.all()
+    if low is not None:
+        stale = stale.filter(user_id__gte=low)
+    if high is not None:
+        stale = stale.filter(user_id__lt=high)
+    with transaction.atomic():
+        stale.delete()
+        Suggestion.objects.bulk_create(
+            [Suggestion(user_id=user_id, author_id=author_id, score=score,
+                        rank=rank)
+             for user_id, author_id, score, rank in rows],
+            batch_size=READ_CHUNK)
+
+
+def rebuild(top_k=None, block_size=None, use_scipy=None):
+    """ Пересчитываем таблицу подсказок «друзья друзей» целиком.
+
+    Подписки читаются из базы одним проходом, подсказки пишутся блоками
+    по ``block_size`` пользователей, каждый блок — своя транзакция,
+    поэтому страницы во время пересчета видят старые или новые
+    подсказки пользователя, но не пустоту. Считается разреженными
+    матрицами SciPy; запасной вариант на Python — только для небольших
+    баз, когда SciPy не установлен. Возвращает число
+    пользователей с подсказками, число подсказок и способ подсчета.
+    """
+    top_k = top_k or settings.SUGGESTIONS_TOP_K
+    block_size = block_size or settings.SUGGESTIONS_BLOCK_SIZE
+    if use_scipy is None:
+        use_scipy = sparse is not None
+    score = _score_sparse if use_scipy else _score_python
+    users, total, stored = set(), 0, False
+    for low, high, rows in score(top_k, block_size):
+        _store(low, high, rows)
+        users.update(row[0] for row in rows)
+        total += len(rows)
+        stored = True
+    if not stored:
+        _store(None, None, [])
+    pagecache.bump(NAMESPACE)
+    return {'users': len(users), 'suggestions': total,
+            'engine': 'scipy' if use_scipy else 'python'}
+
+
+def suggested_for(user, limit=None):
+    """ Подсказки для ``user``: одно чтение таблицы, дальше из кеша до
+    следующего пересчета или его подписки на подсказанного автора. """
+    if not user.is_authenticated:
+        return []
+    limit = limit or settings.SUGGESTIONS_SHOWN
+
+    def fill():
+        return list(Suggestion.objects.filter(user=user)
+                    .select_related('author').order_by('rank')[:limit])
+
+    return caching.get_or_set(f'suggestions:{user.pk}:{limit}', fill,
+                              settings.SUGGESTIONS_TIMEOUT,
+                              tags=[NAMESPACE, user_namespace(user.pk)])
+
+
+def forget(user_id, author_ids):
+    """ Убираем из подсказок авторов, на которых пользователь подписался. """
+    deleted, _ = Suggestion.objects.filter(
+        user_id=user_id, author_id__in=author_ids).delete()
+    if deleted:
+        pagecache.bump(user_namespace(user_id))
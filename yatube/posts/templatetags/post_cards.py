@@ -0,0 +1,45 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+def card_key(post, user):
+    """ Ключ карточки меняется вместе с любыми данными, которые она
+    показывает: версия поста растет при правке, счетчик — при новом
+    комментарии, а имя автора и сообщество входят в дайджест. """
+    group = post.group
+    stamp = '|'.join(str(part) for part in (
+        post.author.username, post.image.name,
+        group.slug if group else '', group.title if group else ''))
+    digest = hashlib.md5(stamp.encode()).hexdigest()[:12]
+    is_author = int(user is not None and user.pk == post.author_id)
+    return (f'post-card:{post.pk}:{post.version}:{post.comment_count}:'
+            f'{is_author}:{digest}')
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """ Выводим карточки постов, доставая их из кеша одним get_many.
+
+    Для недостающих карточек миниатюры находятся одним пакетом.
+    """
+    user = context.get('user')
+    keys = {card_key(post, user): post for post in posts}
+    cards = cache.get_many(keys)
+    missing = {}
+    thumbnails.attach(post for key, post in keys.items() if key not in cards)
+    for key, post in keys.items():
+        if key not in cards:
+            cards[key] = missing[key] = render_to_string(
+                'includes/post_item.html', {'post': post, 'user': user})
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+    return mark_safe(''.join(cards[key] for key in keys))
@@ -0,0 +1,59 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from posts import thumbnails
+
+register = template.Library()
+
+PLACEHOLDER = (
+    "data:image/svg+xml;charset=utf-8,"
+    "%3Csvg xmlns='http://www.w3.org/2000/svg' width='{0}' height='{1}'%3E"
+    "%3Crect width='100%25' height='100%25' fill='%23e9ecef'/%3E%3C/svg%3E")
+
+MIME_TYPES = {'WEBP': 'image/webp'}
+
+
+def _srcset(urls):
+    return format_html_join(', ', '{} {}w', urls)
+
+
+@register.simple_tag
+def post_image(post, size='card'):
+    """ Выводим миниатюры поста, если воркер их уже создал.
+
+    Ссылки берутся из ``post.thumbnail_urls``, которые для всей страницы
+    заранее кладет ``thumbnails.attach``; без них пост проверяется один.
+
+    Готовые миниатюры выводятся через ``<picture>``: WebP и формат
+    исходника в нескольких ширинах, с ленивой загрузкой и размытым
+    превью на фоне. Пока миниатюр нет, выводится превью или заглушка
+    того же размера, а создание ставится в очередь: запрос сам никогда
+    не обрабатывает картинку.
+    """
+    if not post.image:
+        return ''
+    geometry = thumbnails.GEOMETRIES[size]
+    width, height = geometry['size']
+    if not hasattr(post, 'thumbnail_urls'):
+        thumbnails.attach([post], size)
+    found = dict(post.thumbnail_urls or {})
+    if not found:
+        thumbnails.enqueue(post)
+        return format_html(
+            '<img class="card-img" src="{}" width="{}" height="{}" alt="">',
+            post.image_preview or PLACEHOLDER.format(width, height),
+            width, height)
+    original = found.pop(None)
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[image_format], _srcset(urls), geometry['sizes'])
+         for image_format, urls in found.items()))
+    style = (format_html('background: url({}) center / cover',
+                         post.image_preview)
+             if post.image_preview else '')
+    return format_html(
+        '<picture>{}<img class="card-img" src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" loading="lazy" decoding="async" '
+        'style="{}" alt=""></picture>',
+        sources, original[-1][0], _srcset(original), geometry['sizes'],
+        width, height, style)
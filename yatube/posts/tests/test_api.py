@@ -0,0 +1,77 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAG_VAL=2)
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [Post.objects.create(text=f'Пост {number}',
+                                         author=cls.author, group=cls.group)
+                     for number in range(5)]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def walk(self, client, url):
+        texts, cursor = [], ''
+        while cursor is not None:
+            data = client.get(f'{url}?fields=text&cursor={cursor}').json()
+            texts += [item['text'] for item in data['results']]
+            cursor = data['next']
+        return texts
+
+    def test_feeds_are_paginated_by_cursor(self):
+        """ Ленты API отдаются целиком по курсорам, новые сверху."""
+        expected = [f'Пост {number}' for number in range(4, -1, -1)]
+        for client, url in (
+                (self.client, reverse('api_posts')),
+                (self.client, reverse('api_group_posts', args=['group'])),
+                (self.client, reverse('api_profile_posts', args=['VG'])),
+                (self.authorized_client, reverse('api_follow_posts'))):
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(client, url), expected)
+
+    def test_sparse_fields(self):
+        """ В ответе только запрошенные поля."""
+        data = self.client.get(reverse('api_posts'),
+                               {'fields': 'id,author,group'}).json()
+        self.assertEqual(data['results'][0], {
+            'id': self.posts[-1].pk, 'author': 'VG', 'group': 'group'})
+        response = self.client.get(reverse('api_posts'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_follow_feed_requires_login(self):
+        """ Лента подписок без авторизации — 401."""
+        response = self.client.get(reverse('api_follow_posts'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_batch(self):
+        """ Пакетный запрос отдает посты потоком и список ненайденных."""
+        ids = [self.posts[1].pk, self.posts[3].pk, 999]
+        response = self.client.get(reverse('api_posts_batch'), {
+            'ids': ','.join(map(str, ids)), 'fields': 'id,text'})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['results'], [
+            {'id': self.posts[1].pk, 'text': 'Пост 1'},
+            {'id': self.posts[3].pk, 'text': 'Пост 3'}])
+        self.assertEqual(data['missing'], [999])
+        response = self.client.get(reverse('api_posts_batch'), {'ids': 'x'})
+        self.assertEqual(response.status_code, 400)
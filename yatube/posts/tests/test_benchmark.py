@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F, Max, Sum
+from django.test import TestCase, override_settings
+
+from posts import benchmark
+from posts.management.commands.seed_scale import distribute, zipf_weights
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+
+
+class SeedScaleTest(TestCase):
+    def test_seed_scale(self):
+        """ Генератор создает данные с согласованными счетчиками."""
+        call_command('seed_scale', users=50, posts=300, follows=600,
+                     comments=400, timeline_users=5, seed=1,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 400)
+        self.assertEqual(Follow.objects.count(), 600)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        stats = UserStats.objects.aggregate(posts=Sum('posts_count'),
+                                            top=Max('followers_count'))
+        self.assertEqual(stats['posts'], 300)
+        self.assertGreater(stats['top'], 600 / 50 * 2)
+        self.assertEqual(
+            TimelineEntry.objects.values('user').distinct().count(), 5)
+
+    def test_distribute_respects_cap(self):
+        """ Излишек сверх предела достается менее популярным."""
+        counts = distribute(100, zipf_weights(10, 1.1), 15)
+        self.assertEqual(max(counts), 15)
+        self.assertAlmostEqual(sum(counts), 100, delta=5)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE=False)
+class BenchmarkTest(TestCase):
+    def test_run_measures_views(self):
+        """ Замеры содержат запросы и перцентили для каждой страницы."""
+        call_command('seed_scale', users=10, posts=30, follows=40,
+                     comments=20, timeline_users=3, seed=2,
+                     stdout=StringIO())
+        results = benchmark.run(repeat=2)
+        self.assertEqual(set(results),
+                         {'index', 'profile', 'post', 'follow_index'})
+        for result in results.values():
+            self.assertGreater(result['queries'], 0)
+            self.assertLessEqual(result['p50'], result['p99'])
+
+    def test_compare(self):
+        """ Регрессией считается рост запросов или p95 сверх порога."""
+        baseline = {'100': {'index': {'queries': 3, 'p95': 100.0}}}
+
+        def check(queries, p95):
+            return benchmark.compare(
+                baseline, {'100': {'index': {'queries': queries,
+                                             'p95': p95}}}, 0.2)
+
+        self.assertEqual(check(3, 115.0), [])
+        self.assertEqual(len(check(4, 100.0)), 1)
+        self.assertEqual(len(check(3, 130.0)), 1)
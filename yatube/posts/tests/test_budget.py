@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.utils import QueryBudgetMixin
+
+User = get_user_model()
+
+PAGE_SIZES = (1, 5, 10)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Заголовок группы',
+            description='Тестовый текст',
+            slug='test-post-slug'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(25):
+            cls.post = Post.objects.create(text=f'Тестовый {number}',
+                                           author=cls.author,
+                                           group=cls.group)
+            for _ in range(3):
+                Comment.objects.create(post=cls.post, author=cls.reader,
+                                       text='Комментарий')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def test_feeds_within_budget(self):
+        """ Ленты укладываются в бюджет при любом размере страницы."""
+        feeds = {
+            'index': reverse('index'),
+            'group': reverse('group', kwargs={'slug': self.group.slug}),
+            'profile': reverse('profile', kwargs={'username': 'VG'}),
+            'follow_index': reverse('follow_index'),
+            'followers': reverse('followers', kwargs={'username': 'VG'}),
+            'following': reverse('following',
+                                 kwargs={'username': 'reader'}),
+        }
+        for per_page in PAGE_SIZES:
+            for url_name, url in feeds.items():
+                for page in (f'{url}', f'{url}?page=2'):
+                    with self.subTest(url=page, per_page=per_page), \
+                            override_settings(PAG_VAL=per_page):
+                        self.assertWithinBudget(self.authorized_client,
+                                                page, url_name)
+
+    def test_post_view_within_budget(self):
+        """ Страница поста укладывается в бюджет."""
+        self.assertWithinBudget(
+            self.authorized_client,
+            reverse('post', kwargs={'username': 'VG',
+                                    'post_id': self.post.id}),
+            'post')
+
+    @override_settings(QUERY_STATS_HEADER=True)
+    def test_stats_header(self):
+        """ Статистика запросов отдается в заголовках по настройке."""
+        response = self.authorized_client.get(reverse('index'))
+        self.assertIn('X-Query-Count', response)
+        self.assertIn('X-Query-Time', response)
+        self.assertEqual(response['X-Query-Repeats'], '0')
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from posts import caching
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = caching.TieredCache('tiered-test', {
+            'OPTIONS': {
+                'SHARED': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'tiered-test-shared',
+                },
+                'LOCAL_PREFIXES': ('card:',),
+                'LOCAL_MAX_ENTRIES': 2,
+            },
+        })
+        self.cache.clear()
+
+    def test_versioned_keys_are_kept_locally(self):
+        """ Ключи с префиксом отдаются из процесса без общего слоя. """
+        self.cache.set('card:1:v1', 'карточка')
+        self.cache.shared.delete('card:1:v1')
+        self.assertEqual(self.cache.get('card:1:v1'), 'карточка')
+        self.assertEqual(self.cache.get_many(['card:1:v1']),
+                         {'card:1:v1': 'карточка'})
+
+    def test_other_keys_are_shared(self):
+        """ Остальные ключи всегда читаются из общего слоя. """
+        self.cache.set('generation', 1)
+        self.cache.shared.incr('generation')
+        self.assertEqual(self.cache.get('generation'), 2)
+        self.assertEqual(self.cache.incr('generation'), 3)
+
+    def test_local_lru(self):
+        """ Локальный слой держит не больше LOCAL_MAX_ENTRIES ключей. """
+        for number in range(3):
+            self.cache.set(f'card:{number}', number)
+        self.cache.shared.clear()
+        self.assertIsNone(self.cache.get('card:0'))
+        self.assertEqual(self.cache.get('card:2'), 2)
+
+    def test_filled_from_shared(self):
+        """ Промах локального слоя заполняется из общего. """
+        self.cache.shared.set('card:5', 'из общего')
+        self.assertEqual(self.cache.get('card:5'), 'из общего')
+        self.cache.shared.clear()
+        self.assertEqual(self.cache.get('card:5'), 'из общего')
+        self.cache.delete('card:5')
+        self.assertIsNone(self.cache.get('card:5'))
+
+
+@override_settings(CACHE_FILL_TIMEOUT=2)
+class GetOrSetTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def fill(self, value='значение', delay=0):
+        def fill():
+            self.calls.append(value)
+            time.sleep(delay)
+            return value
+        return fill
+
+    def test_tags(self):
+        """ Сдвиг тега сбрасывает запись, чужие теги ее не трогают. """
+        def get():
+            caching.get_or_set('stats', self.fill(), 60,
+                               tags=['post:42', 'author:VG'])
+
+        get()
+        get()
+        caching.invalidate('post:7')
+        get()
+        self.assertEqual(len(self.calls), 1)
+        caching.invalidate('post:42')
+        get()
+        self.assertEqual(len(self.calls), 2)
+
+    def test_single_fill_for_concurrent_misses(self):
+        """ Одновременные промахи заполняет один поток, остальные ждут. """
+        results = []
+        fill = self.fill(delay=0.2)
+        threads = [threading.Thread(target=lambda: results.append(
+            caching.get_or_set('hot', fill, 60))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, ['значение'])
+        self.assertEqual(results, ['значение'] * 8)
+
+    def test_stale_value_while_refilling(self):
+        """ Пока другой пересчитывает истекшую запись, отдается прежняя. """
+        caching.get_or_set('hot', self.fill('старое'), 60)
+        value, versions, _, cost = cache.get('hot')
+        cache.set('hot', (value, versions, time.time() - 1, cost))
+        cache.add('fill-lock:hot', 1)
+        self.assertEqual(
+            caching.get_or_set('hot', self.fill('новое'), 60), 'старое')
+        cache.delete('fill-lock:hot')
+        self.assertEqual(
+            caching.get_or_set('hot', self.fill('новое'), 60), 'новое')
+
+    def test_none_is_not_cached(self):
+        caching.get_or_set('missing', self.fill(None), 60)
+        caching.get_or_set('missing', self.fill(None), 60)
+        self.assertEqual(self.calls, [None, None])
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.counters import bump_post_version
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PostCardsCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.group = Group.objects.create(
+            title='Заголовок группы',
+            description='Тестовый текст',
+            slug='test-post-slug'
+        )
+        cls.post = Post.objects.create(text='Тестовый', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        cache.clear()
+
+    def index(self, client=None):
+        return (client or self.guest_client).get(
+            reverse('index')).content.decode()
+
+    def test_cards_are_served_from_cache(self):
+        """ Повторный показ карточки не рендерит ее заново."""
+        self.index()
+        Post.objects.filter(pk=self.post.pk).update(text='Тайком')
+        self.assertIn('Тестовый', self.index())
+
+    def test_edit_is_visible_immediately(self):
+        """ Правка поста сразу видна в ленте."""
+        self.index()
+        self.authorized_client.post(
+            reverse('post_edit', kwargs={'username': 'VG',
+                                         'post_id': self.post.id}),
+            {'text': 'Исправленный'})
+        content = self.index()
+        self.assertIn('Исправленный', content)
+        self.assertNotIn('Тестовый', content)
+
+    def test_edit_after_concurrent_version_bump(self):
+        """ Правка видна, даже если версию сдвинули после загрузки
+        поста (например, готовая миниатюра)."""
+        post = Post.objects.get(pk=self.post.pk)
+        bump_post_version(self.post.pk)
+        self.index()
+        post.text = 'Исправленный'
+        post.save()
+        self.assertIn('Исправленный', self.index())
+
+    def test_comment_and_group_change_refresh_card(self):
+        """ Новый комментарий и переименование группы обновляют карточку."""
+        self.index()
+        Comment.objects.create(post=self.post, author=self.author, text='1')
+        self.assertIn('Комментариев: 1', self.index())
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertIn('Новое название', self.index())
+
+    def test_author_sees_own_variant(self):
+        """ Автор и гость получают разные варианты карточки."""
+        self.assertNotIn('Редактировать', self.index())
+        self.assertIn('Редактировать', self.index(self.authorized_client))
+
+    def test_cached_page_skips_rendering_queries(self):
+        """ Страница из закешированных карточек не ходит за ними в базу."""
+        self.index()
+        with CaptureQueriesContext(connection) as queries:
+            self.index()
+        self.assertLessEqual(len(queries), 2)
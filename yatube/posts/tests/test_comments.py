@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.tests.utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PAGE=3)
+class CommentsPageTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.post = Post.objects.create(text='Тестовый', author=cls.author)
+        for number in range(7):
+            Comment.objects.create(
+                post=cls.post, text=f'Комментарий {number}',
+                author=User.objects.create_user(username=f'reader{number}'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_post_view_shows_newest_comments(self):
+        """ На странице поста только последние комментарии."""
+        response = self.client.get(
+            reverse('post', args=[self.author.username, self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual(self.texts(comments), [
+            'Комментарий 6', 'Комментарий 5', 'Комментарий 4'])
+        self.assertContains(response, 'data-fragment="%s?cursor=%s"' % (
+            reverse('post_comments',
+                    args=[self.author.username, self.post.pk]),
+            comments.next_cursor))
+
+    def test_fragment_loads_next_comments(self):
+        """ Фрагмент отдает следующие страницы до самой старой."""
+        url = reverse('post_comments',
+                      args=[self.author.username, self.post.pk])
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            response = self.assertWithinBudget(
+                self.client, f'{url}?cursor={cursor}', 'post_comments')
+            self.assertNotContains(response, '<html')
+            pages.append(self.texts(response.context['comments']))
+            cursor = response.context['comments'].next_cursor
+        self.assertEqual(pages, [
+            ['Комментарий 6', 'Комментарий 5', 'Комментарий 4'],
+            ['Комментарий 3', 'Комментарий 2', 'Комментарий 1'],
+            ['Комментарий 0']])
+        self.assertNotContains(response, 'data-fragment')
+
+    def test_fragment_of_missing_post(self):
+        """ Фрагмент чужого или несуществующего поста — 404."""
+        response = self.client.get(
+            reverse('post_comments', args=['reader0', self.post.pk]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+# Без реплик: свежие страницы не ждут задержки реплик.
+@override_settings(DATABASE_REPLICAS=[])
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Заголовок группы',
+            description='Тестовый текст',
+            slug='test-post-slug'
+        )
+        cls.post = Post.objects.create(text='Тестовый', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def revalidate(self, url, client=None):
+        """ Повторяем запрос с валидаторами предыдущего ответа.
+
+        Первый ответ может выставить CSRF-cookie, от которой зависит ETag,
+        поэтому валидаторы берутся со второго.
+        """
+        client = client or self.guest_client
+        client.get(url)
+        first = client.get(url)
+        self.assertEqual(first.status_code, 200)
+        return client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_pages_answer_304(self):
+        """ Неизменная страница отдается как 304 без тела. """
+        urls = [reverse('index'),
+                reverse('group', kwargs={'slug': self.group.slug}),
+                reverse('profile', kwargs={'username': 'VG'}),
+                reverse('post', kwargs={'username': 'VG',
+                                        'post_id': self.post.id}),
+                reverse('api_posts')]
+        for url in urls:
+            for client in (self.guest_client, self.authorized_client):
+                with self.subTest(url=url, client=client):
+                    response = self.revalidate(url, client)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+                    self.assertIn('ETag', response)
+
+    def test_not_modified_skips_queries(self):
+        """ Ответ 304 гостю не ходит в базу. """
+        url = reverse('post', kwargs={'username': 'VG',
+                                      'post_id': self.post.id})
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_authorized_not_modified_skips_queries(self):
+        """ Ответ 304 пользователю не загружает сессию. """
+        url = reverse('index')
+        self.authorized_client.get(url)
+        etag = self.authorized_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_last_modified(self):
+        """ По If-Modified-Since страница тоже отдается как 304. """
+        url = reverse('index')
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """ Новый комментарий и правка поста меняют ETag. """
+        url = reverse('post', kwargs={'username': 'VG',
+                                      'post_id': self.post.id})
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.post.text = 'Исправленный'
+        self.post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный')
+
+    def test_etag_depends_on_user(self):
+        """ Разные пользователи получают разные ETag одной страницы. """
+        url = reverse('index')
+        guest = self.guest_client.get(url)['ETag']
+        reader = self.authorized_client.get(url)['ETag']
+        self.assertNotEqual(guest, reader)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=guest)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_index(self):
+        """ Лента подписок отдает 304, пока ее карточки не менялись. """
+        Follow.objects.create(user=self.reader, author=self.author)
+        timeline.rebuild([self.reader.pk])
+        url = reverse('follow_index')
+        response = self.revalidate(url, self.authorized_client)
+        self.assertEqual(response.status_code, 304)
+        etag = response['ETag']
+        Post.objects.create(text='Новый', author=self.author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый')
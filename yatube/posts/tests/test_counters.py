@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Тестовый', author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_add_comment_bumps_counter(self):
+        """ add_comment увеличивает счетчик комментариев поста."""
+        self.authorized_client.post(
+            reverse('add_comment', kwargs={'username': 'author',
+                                           'post_id': self.post.id}),
+            {'text': 'Комментарий'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        Comment.objects.get().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_edit_keeps_concurrent_comment(self):
+        """ Сохранение поста, загруженного до комментария, не затирает
+        счетчик комментариев."""
+        post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        post.text = 'Исправленный'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Исправленный')
+        self.assertEqual(post.comment_count, 1)
+
+    def test_post_new_bumps_counter(self):
+        """ post_new и удаление поста меняют счетчик постов автора."""
+        self.authorized_client.post(reverse('new_post'), {'text': 'Новый'})
+        self.assertEqual(self.stats(self.reader).posts_count, 1)
+        Post.objects.filter(author=self.reader).delete()
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
+
+    def test_follow_and_unfollow_bump_counters(self):
+        """ Подписка и отписка меняют счетчики обеих сторон."""
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': 'author'}))
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+
+    def test_recount_stats_repairs_drift(self):
+        """ Команда recount_stats чинит разошедшиеся счетчики."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=self.post, author=self.reader, text='1')
+        Post.objects.update(comment_count=7)
+        UserStats.objects.update(posts_count=5, followers_count=5,
+                                 following_count=5)
+        call_command('recount_stats', batch_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.reader).followers_count, 0)
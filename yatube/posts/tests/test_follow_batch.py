@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follows
+from posts.counters import get_user_stats
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(FOLLOW_BATCH_SIZE=2)
+class FollowBatchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(5)]
+        cls.names = [author.username for author in cls.authors]
+        Post.objects.create(text='Пост', author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def stats(self, user):
+        return get_user_stats(User.objects.get(pk=user.pk))
+
+    def test_follow_batch(self):
+        """ Подписки пачками: счетчики, лента и неизвестные имена. """
+        result = follows.apply_batch(
+            self.reader, self.names + ['reader', 'author0', 'ghost'])
+        self.assertEqual(result, {'followed': 5, 'unfollowed': 0,
+                                  'unknown': ['ghost']})
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(self.stats(self.reader).following_count, 5)
+        self.assertEqual(self.stats(self.authors[3]).followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader)
+                        .exists())
+        self.assertEqual(follows.following_ids(self.reader.pk),
+                         {author.pk for author in self.authors})
+        again = follows.apply_batch(self.reader, self.names[:3])
+        self.assertEqual(again['followed'], 0)
+
+    def test_unfollow_batch(self):
+        follows.apply_batch(self.reader, self.names)
+        result = follows.apply_batch(self.reader,
+                                     unfollow=self.names[:3] + ['ghost'])
+        self.assertEqual(result, {'followed': 0, 'unfollowed': 3,
+                                  'unknown': ['ghost']})
+        self.assertEqual(self.stats(self.reader).following_count, 2)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 0)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader)
+                         .exists())
+
+    def test_queries_do_not_grow_per_row(self):
+        """ Число запросов зависит от числа пачек, а не строк. """
+        def count(names):
+            Follow.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                follows.apply_batch(self.reader, names)
+            return len(queries)
+
+        get_user_stats(self.reader)
+        with self.settings(FOLLOW_BATCH_SIZE=500):
+            self.assertEqual(count(self.names[1:3]), count(self.names))
+
+    def test_timeline_follows_changed_authors(self):
+        """ Лента меняется только по авторам пачки: новые получают
+        последние посты, отписка удаляет посты одного автора, не
+        перестраивая ленту по каждому оставшемуся автору. """
+        for number in range(3):
+            Post.objects.create(text=f'Новый {number}',
+                                author=self.authors[1])
+        with self.settings(FOLLOW_BATCH_SIZE=500, TIMELINE_BACKFILL=2):
+            follows.apply_batch(self.reader, self.names)
+        texts = set(TimelineEntry.objects.filter(user=self.reader)
+                    .values_list('post__text', flat=True))
+        self.assertEqual(texts, {'Пост', 'Новый 1', 'Новый 2'})
+        get_user_stats(self.reader)
+        with self.assertNumQueries(7):
+            follows.apply_batch(self.reader, unfollow=self.names[1:2])
+        self.assertEqual(list(TimelineEntry.objects.filter(user=self.reader)
+                              .values_list('post__text', flat=True)),
+                         ['Пост'])
+
+    def test_api(self):
+        """ API принимает списки JSON и отвечает итогом. """
+        url = reverse('api_follow_batch')
+        response = self.authorized_client.post(
+            url, json.dumps({'follow': self.names[:2], 'unfollow': []}),
+            content_type='application/json')
+        self.assertEqual(response.json(), {'followed': 2, 'unfollowed': 0,
+                                           'unknown': []})
+        bad = self.authorized_client.post(
+            url, json.dumps({'follow': 'author0'}),
+            content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(
+            Client().post(url, '{}', content_type='application/json')
+            .status_code, 401)
+        self.assertEqual(self.authorized_client.get(url).status_code, 405)
+
+    def test_counters_move_by_changed_rows(self):
+        """ Счетчики сдвигаются только для действительно измененных
+        подписок, без пересчета всей аудитории автора. """
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.authors[0])
+        follows.apply_batch(self.reader, self.names[:2])
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 2)
+        follows.apply_batch(self.reader, self.names[:3])
+        self.assertEqual(self.stats(self.reader).following_count, 3)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 2)
+        with CaptureQueriesContext(connection) as queries:
+            follows.apply_batch(self.reader, unfollow=self.names[:1])
+        self.assertFalse([query for query in queries
+                          if 'COUNT(' in query['sql']])
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 2)
+
+    def test_import_export_commands(self):
+        """ Экспорт подписок читается импортом. """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'follows.txt')
+            with open(path, 'w') as names:
+                names.write('\n'.join(self.names[:3]) + '\n\nghost\n')
+            output = StringIO()
+            call_command('import_follows', 'reader', path,
+                         stdout=output, stderr=StringIO())
+        self.assertIn('Новых подписок: 3', output.getvalue())
+        output = StringIO()
+        call_command('export_follows', 'reader', stdout=output)
+        self.assertEqual(output.getvalue().split(), self.names[:3])
+        output = StringIO()
+        call_command('export_follows', 'author0', '--followers',
+                     stdout=output)
+        self.assertEqual(output.getvalue().split(), ['reader'])
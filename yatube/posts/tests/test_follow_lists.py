@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Follow
+
+User = get_user_model()
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE=False, PAG_VAL=2)
+class FollowListTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fans = [User.objects.create_user(username=f'fan{number}')
+                    for number in range(3)]
+        for fan in cls.fans:
+            Follow.objects.create(user=fan, author=cls.author)
+        Follow.objects.create(user=cls.author, author=cls.fans[2])
+        Follow.objects.create(user=cls.reader, author=cls.fans[1])
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def rows(self, response):
+        return {row['person'].username: (row['following'], row['mutual'])
+                for row in response.context['page']}
+
+    def test_followers_page(self):
+        """ Подписчики от новых к старым с флагами зрителя и взаимности. """
+        url = reverse('followers', args=[self.author.username])
+        response = self.authorized_client.get(url)
+        self.assertEqual(self.rows(response), {'fan2': (False, True),
+                                               'fan1': (True, False)})
+        page = response.context['page']
+        response = self.authorized_client.get(
+            f'{url}?cursor={page.next_cursor}')
+        self.assertEqual(self.rows(response), {'fan0': (False, False)})
+
+    def test_following_page(self):
+        url = reverse('following', args=[self.author.username])
+        response = self.authorized_client.get(url)
+        self.assertEqual(self.rows(response), {'fan2': (False, True)})
+        response = Client().get(url)
+        self.assertEqual(self.rows(response), {'fan2': (False, True)})
+        self.assertEqual(
+            self.client.get(reverse('following', args=['ghost']))
+            .status_code, 404)
+
+    def test_flags_are_one_query(self):
+        """ Флаги страницы — один запрос, сколько бы ни было строк. """
+        ids = [fan.pk for fan in self.fans]
+        with self.assertNumQueries(1):
+            viewed, mutual = follows.relations(self.reader, self.author, ids)
+        self.assertEqual(viewed, {self.fans[1].pk})
+        self.assertEqual(mutual, {self.fans[2].pk})
+        with self.assertNumQueries(0):
+            follows.relations(self.reader, self.author, [])
+
+    def test_profile_links_to_lists(self):
+        response = self.client.get(reverse('profile',
+                                           args=[self.author.username]))
+        self.assertContains(response,
+                            reverse('followers', args=[self.author.username]))
+        self.assertContains(response,
+                            reverse('following', args=[self.author.username]))
@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts import follows
+from posts.models import Follow, UserStats
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_is_idempotent(self):
+        """ Повторная подписка не создает строку и не трогает счетчики. """
+        author = self.authors[0]
+        self.assertTrue(follows.follow(self.reader, author))
+        self.assertFalse(follows.follow(self.reader, author))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(author).followers_count, 1)
+
+    def test_unfollow_is_idempotent(self):
+        """ Повторная отписка ничего не делает. """
+        author = self.authors[0]
+        follows.follow(self.reader, author)
+        self.assertTrue(follows.unfollow(self.reader, author))
+        self.assertFalse(follows.unfollow(self.reader, author))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.stats(author).followers_count, 0)
+
+    def test_follow_is_single_statement(self):
+        """ Подписка и отписка — по одному запросу без чтения. """
+        author = self.authors[0]
+        follows.follow(self.reader, author)
+        with CaptureQueriesContext(connection) as queries:
+            follows.follow(self.reader, author)
+            follows.unfollow(self.reader, self.authors[1])
+        statements = [query['sql'].split()[0] for query in queries
+                      if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(statements, ['INSERT', 'DELETE'])
+
+    def test_cannot_follow_self(self):
+        self.assertFalse(follows.follow(self.reader, self.reader))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_is_following(self):
+        """ Первая проверка заполняет множество подписок, дальше — без
+        запросов."""
+        follows.follow(self.reader, self.authors[0])
+        with self.assertNumQueries(1):
+            self.assertTrue(follows.is_following(self.reader,
+                                                 self.authors[0]))
+        with self.assertNumQueries(0):
+            self.assertFalse(follows.is_following(self.reader,
+                                                  self.authors[1]))
+            self.assertEqual(follows.following_among(
+                self.reader, [author.pk for author in self.authors]),
+                {self.authors[0].pk})
+        self.assertFalse(follows.is_following(AnonymousUser(),
+                                              self.authors[0]))
+
+    @override_settings(FOLLOW_SET_MAX=1)
+    def test_long_following_list_is_not_cached(self):
+        """ Длинный список подписок не кешируется, проверка — запрос."""
+        follows.follow(self.reader, self.authors[0])
+        follows.follow(self.reader, self.authors[1])
+        self.assertIsNone(follows.following_ids(self.reader.pk))
+        with self.assertNumQueries(1):
+            self.assertTrue(follows.is_following(self.reader,
+                                                 self.authors[1]))
+        follows.unfollow(self.reader, self.authors[1])
+        self.assertEqual(follows.following_ids(self.reader.pk),
+                         {self.authors[0].pk})
+
+    def test_following_among(self):
+        """ Пакетная проверка для страницы авторов одним запросом. """
+        follows.follow(self.reader, self.authors[0])
+        follows.follow(self.reader, self.authors[2])
+        ids = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            found = follows.following_among(self.reader, ids)
+        self.assertEqual(found, {self.authors[0].pk, self.authors[2].pk})
+
+    def test_cached_sets_follow_changes(self):
+        """ Закешированные множества сбрасываются при подписке. """
+        author = self.authors[0]
+        self.assertEqual(follows.following_ids(self.reader.pk), set())
+        follows.follow(self.reader, author)
+        self.assertEqual(follows.following_ids(self.reader.pk), {author.pk})
+        Follow.objects.get().delete()
+        self.assertEqual(follows.following_ids(self.reader.pk), set())
@@ -11,6 +11,7 @@ from django.urls import reverse
 
 from posts.forms import PostForm
 from posts.models import Group, Post
+from users.forms import CreationForm
 
 User = get_user_model()
 
@@ -87,11 +88,8 @@ class PostsFormTests(TestCase):
         self.assertRedirects(response, reverse('index'))
         self.assertEqual(Post.objects.count(), posts_count + 1)
         self.assertEqual(response.status_code, HTTPStatus.OK)
-        self.assertTrue(
-            Post.objects.filter(
-                text='Тестовый текст',
-                group=None,
-                image='posts/small.gif').exists())
+        post = Post.objects.get(text='Тестовый текст', group=None)
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w\w/\w{64}\.jpg$')
 
     def test_edit_post(self):
         """Редактирование записи."""
@@ -132,3 +130,29 @@ class PostsFormTests(TestCase):
                             'post_id': f'{self.post.id}'}))
         self.assertEqual(PostsFormTests.post, post_user)
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class SignUpFormTests(TestCase):
+    def signup(self, username):
+        return CreationForm(data={
+            'username': username,
+            'password1': 'Ne-prostoi-parol-42',
+            'password2': 'Ne-prostoi-parol-42',
+        })
+
+    def test_route_names_are_reserved(self):
+        """Имена search, api и другие заняты адресами и не регистрируются."""
+        for username in ('search', 'api', 'new', 'follow', 'admin'):
+            with self.subTest(username=username):
+                form = self.signup(username)
+                self.assertFalse(form.is_valid())
+                self.assertTrue(form.has_error('username',
+                                               'reserved_username'))
+
+    def test_regular_name_is_allowed(self):
+        """Обычное имя регистрируется, а его профиль открывается."""
+        form = self.signup('searcher')
+        self.assertTrue(form.is_valid())
+        form.save()
+        response = self.client.get(reverse('profile', args=['searcher']))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,74 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from posts import loadtest
+from posts.management.commands.loadtest import Command
+from posts.models import Post
+from yatube.wsgi import application
+
+User = get_user_model()
+
+
+class LoadTestTest(TestCase):
+    def test_read_log(self):
+        """ Из журнала берутся только GET и HEAD."""
+        lines = [
+            '1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] '
+            '"GET /group/cats/?page=2 HTTP/1.1" 200 512 "-" "curl"',
+            '1.2.3.4 - - [18/Oct/2026:10:00:01 +0000] '
+            '"POST /new/ HTTP/1.1" 302 0',
+            'мусор',
+        ]
+        self.assertEqual(list(loadtest.read_log(lines)),
+                         [('GET', '/group/cats/?page=2')])
+        self.assertEqual(loadtest.url_name('/group/cats/?page=2'), 'group')
+
+    def test_summarize(self):
+        """ Сводка считает пропускную способность и долю ошибок."""
+        summary = loadtest.summarize(
+            [('index', 200, 10.0), ('index', 500, 30.0),
+             ('post', None, None), ('post', 200, 5.0)], elapsed=2.0)
+        self.assertEqual(summary['throughput'], 2.0)
+        self.assertEqual(summary['errors'], 2)
+        self.assertEqual(summary['error_rate'], 0.5)
+        self.assertEqual(summary['views']['index']['p99'], 30.0)
+
+    def test_exceptions_are_not_latency(self):
+        """ Упавший запрос считается ошибкой, но не нулевой задержкой."""
+        summary = loadtest.summarize(
+            [('post', None, None), ('post', 200, 5.0),
+             ('feed', None, None)], elapsed=1.0)
+        post = summary['views']['post']
+        self.assertEqual((post['requests'], post['errors']), (2, 1))
+        self.assertEqual(post['p50'], 5.0)
+        self.assertIsNone(summary['views']['feed']['p99'])
+
+    def test_failed_request_in_report(self):
+        """ Исключение приложения попадает в сводку как ошибка."""
+        def broken(environ, start_response):
+            raise RuntimeError('сбой')
+
+        command = Command()
+        sample = command._execute(broken, 'index', 'GET', '/', None, '')
+        self.assertEqual(sample, ('index', None, None))
+        command.stdout = StringIO()
+        command._report(loadtest.summarize([sample], elapsed=1.0))
+        self.assertIn('ошибок 1 (100.0%)', command.stdout.getvalue())
+
+    @override_settings(ANONYMOUS_PAGE_CACHE=False)
+    def test_requests_through_wsgi(self):
+        """ Чтение и запись с входом и CSRF проходят через WSGI."""
+        command = Command()
+        command.sessions = []
+        token, cookie = command._login(
+            User.objects.create_user(username='loader'))
+        status, _ = loadtest.call(application,
+                                  loadtest.environ_for('GET', '/'))
+        self.assertEqual(status, 200)
+        status, _ = loadtest.call(application, loadtest.environ_for(
+            'POST', '/new/', {'text': 'Нагрузка',
+                              'csrfmiddlewaretoken': token}, cookie))
+        self.assertEqual(status, 302)
+        self.assertTrue(Post.objects.filter(text='Нагрузка').exists())
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImagePreviewMigrationTest(TransactionTestCase):
+    before = [('posts', '0013_image_storage')]
+    after = [('posts', '0014_image_preview')]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph
+                     .leaf_nodes())
+        super().tearDown()
+
+    def test_existing_images_get_previews(self):
+        """ Миграция считает превью для уже загруженных изображений."""
+        apps = self.migrate(self.before)
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'), exist_ok=True)
+        Image.new('RGBA', (40, 30), 'red').save(
+            os.path.join(MEDIA_ROOT, 'posts', 'old.png'))
+        author = apps.get_model('auth', 'User').objects.create(
+            username='VG')
+        Post = apps.get_model('posts', 'Post')
+        Post.objects.create(text='С картинкой', author_id=author.pk,
+                            image='posts/old.png')
+        Post.objects.create(text='Без картинки', author_id=author.pk)
+
+        apps = self.migrate(self.after)
+        previews = dict(apps.get_model('posts', 'Post').objects
+                        .values_list('text', 'image_preview'))
+        self.assertTrue(previews['С картинкой'].startswith(
+            'data:image/jpeg;base64,'))
+        self.assertEqual(previews['Без картинки'], '')
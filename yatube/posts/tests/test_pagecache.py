@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import pagecache
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+# Без реплик: свежие страницы не ждут задержки реплик.
+@override_settings(DATABASE_REPLICAS=[])
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.group = Group.objects.create(
+            title='Заголовок группы',
+            description='Тестовый текст',
+            slug='test-post-slug'
+        )
+        cls.post = Post.objects.create(text='Тестовый', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        cache.clear()
+
+    def get(self, url, client=None):
+        return (client or self.guest_client).get(url)
+
+    def test_anonymous_pages_are_cached(self):
+        """ Повторный запрос гостя отдается из кеша."""
+        urls = [reverse('index'),
+                reverse('group', kwargs={'slug': self.group.slug}),
+                reverse('profile', kwargs={'username': 'VG'}),
+                reverse('post', kwargs={'username': 'VG',
+                                        'post_id': self.post.id})]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)['X-Page-Cache'], 'miss')
+                self.assertEqual(self.get(url)['X-Page-Cache'], 'hit')
+        self.assertEqual(pagecache.stats()['hits'], 4)
+        self.assertEqual(pagecache.stats()['misses'], 4)
+
+    def test_authorized_user_bypasses_cache(self):
+        """ Авторизованный пользователь всегда видит свежую страницу."""
+        self.get(reverse('index'))
+        response = self.get(reverse('index'), self.authorized_client)
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_new_post_bumps_feeds(self):
+        """ Новый пост сразу виден гостю на главной и в сообществе."""
+        index = reverse('index')
+        group = reverse('group', kwargs={'slug': self.group.slug})
+        self.get(index)
+        self.get(group)
+        self.authorized_client.post(reverse('new_post'),
+                                    {'text': 'Свежий',
+                                     'group': self.group.pk})
+        for url in (index, group):
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'miss')
+                self.assertContains(response, 'Свежий')
+
+    def test_comment_bumps_post_page(self):
+        """ Новый комментарий сразу виден гостю на странице поста."""
+        url = reverse('post', kwargs={'username': 'VG',
+                                      'post_id': self.post.id})
+        self.get(url)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Новый комментарий')
+        self.assertContains(self.get(url), 'Новый комментарий')
+
+    def test_deleted_comment_bumps_feeds(self):
+        """ Удаленный комментарий сразу пропадает из счетчика на главной."""
+        url = reverse('index')
+        comment = Comment.objects.create(post=self.post, author=self.author,
+                                         text='Новый комментарий')
+        self.assertContains(self.get(url), 'Комментариев: 1')
+        comment.delete()
+        response = self.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertNotContains(response, 'Комментариев:')
+
+    def test_post_delete_cascades_comments(self):
+        """ Комментарии удаляемого поста не сбрасывают ленты по одному."""
+        post = Post.objects.create(text='На удаление', author=self.author)
+        for number in range(3):
+            Comment.objects.create(post=post, author=self.author,
+                                   text=f'Комментарий {number}')
+        url = reverse('index')
+        self.get(url)
+        with mock.patch('posts.pagecache.bump',
+                        wraps=pagecache.bump) as bump:
+            post.delete()
+        bump.assert_called_once()
+        self.assertNotContains(self.get(url), 'На удаление')
+
+    def test_follow_bumps_profile(self):
+        """ Подписка сразу меняет счетчики в профиле автора."""
+        url = reverse('profile', kwargs={'username': 'VG'})
+        self.get(url)
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=self.author)
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'miss')
+
+    def test_unrelated_feed_stays_cached(self):
+        """ Пост без сообщества не сбрасывает кеш сообщества."""
+        url = reverse('group', kwargs={'slug': self.group.slug})
+        self.get(url)
+        Post.objects.create(text='Без группы', author=self.author)
+        self.assertEqual(self.get(url)['X-Page-Cache'], 'hit')
@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post
+from posts.paginator import CursorPaginator, encode_cursor
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='VG')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый {number}', author=author)
+            for number in range(47))
+        # Половина постов с одинаковой датой, чтобы проверить сортировку
+        # по второму ключу.
+        same_date = timezone.now()
+        Post.objects.filter(pk__in=list(
+            Post.objects.values_list('pk', flat=True)[:20])).update(
+            pub_date=same_date)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk')
+                            .values_list('pk', flat=True))
+
+    def setUp(self):
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_walk_forward_and_back(self):
+        """ Переходы по токенам обходят ленту без пропусков и повторов."""
+        seen, numbers = [], []
+        page = self.paginator.get_page()
+        pages = [page]
+        while True:
+            seen.extend(post.pk for post in page)
+            numbers.append(page.number)
+            if not page.has_next():
+                break
+            page = self.paginator.get_page(page.next_cursor)
+            pages.append(page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(numbers, [1, 2, 3, 4, 5])
+
+        while page.has_previous():
+            expected_page = pages[page.number - 2]
+            page = self.paginator.get_page(page.previous_cursor)
+            self.assertEqual([post.pk for post in page],
+                             [post.pk for post in expected_page])
+        self.assertEqual(page.number, 1)
+
+    def test_page_links_window(self):
+        """ Ссылки на страницы ограничены окном вокруг текущей."""
+        page = self.paginator.get_page(page_number=3)
+        self.assertEqual([link['number'] for link in page.page_links],
+                         [1, 2, 3, 4, 5])
+        for link in page.page_links:
+            if link['cursor']:
+                target = self.paginator.get_page(link['cursor'])
+                self.assertEqual(target.number, link['number'])
+                self.assertEqual(
+                    target[0].pk, self.expected[(link['number'] - 1) * 10])
+
+    def test_no_count_query(self):
+        """ Страница строится без COUNT и за постоянное число запросов."""
+        cursor = self.paginator.get_page(page_number=3).next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            page = self.paginator.get_page(cursor)
+            list(page)
+        self.assertEqual(len(queries), 3)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT', query['sql'])
+
+    def test_broken_cursor_returns_first_page(self):
+        """ Битый токен возвращает первую страницу."""
+        page = self.paginator.get_page('not-a-cursor')
+        self.assertEqual(page.number, 1)
+        self.assertEqual(page[0].pk, self.expected[0])
+
+    def test_malformed_cursor_key_returns_first_page(self):
+        """ Токен с ключом не той длины или формы — первая страница."""
+        for values in ([], ['x'], 'строка', {'k': 1},
+                       [None, None, None], [['2021-01-01'], 5]):
+            with self.subTest(values=values):
+                page = self.paginator.get_page(encode_cursor(values, 2))
+                self.assertEqual(page.number, 1)
+                self.assertEqual(page[0].pk, self.expected[0])
+
+    @override_settings(ANONYMOUS_PAGE_CACHE=False)
+    def test_malformed_cursor_in_views(self):
+        """ Ленты и поиск не падают на токене с коротким ключом."""
+        urls = [reverse('index'), reverse('profile', args=['VG']),
+                reverse('api_posts'), reverse('search') + '?q=Тестовый']
+        for values in ([], ['x']):
+            token = encode_cursor(values, 2)
+            for url in urls:
+                with self.subTest(url=url, values=values):
+                    separator = '&' if '?' in url else '?'
+                    response = self.client.get(
+                        f'{url}{separator}cursor={token}')
+                    self.assertEqual(response.status_code, 200)
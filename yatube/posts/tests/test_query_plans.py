@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.utils import QueryPlanMixin
+
+User = get_user_model()
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE=False, PAG_VAL=2)
+class QueryPlanTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(5):
+            fan = User.objects.create_user(username=f'fan{number}')
+            Follow.objects.create(user=fan, author=cls.author)
+        for number in range(5):
+            cls.post = Post.objects.create(text=f'Пост {number}',
+                                           author=cls.author,
+                                           group=cls.group)
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_views_use_indexes(self):
+        """ Запросы страниц идут по индексам, без полного скана и
+        сортировки во временном B-дереве."""
+        urls = [
+            reverse('index'),
+            reverse('index') + '?page=2',
+            reverse('group', args=[self.group.slug]),
+            reverse('profile', args=[self.author.username]),
+            reverse('post', args=[self.author.username, self.post.pk]),
+            reverse('post_comments',
+                    args=[self.author.username, self.post.pk]),
+            reverse('follow_index'),
+            reverse('api_posts'),
+            reverse('api_group_posts', args=[self.group.slug]),
+            reverse('api_profile_posts', args=[self.author.username]),
+            reverse('api_follow_posts'),
+            reverse('followers', args=[self.author.username]),
+            reverse('following', args=[self.reader.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertIndexedPlans(self.authorized_client, url)
+
+    def test_cursor_pages_use_indexes(self):
+        """ Страницы по курсору вперед и назад тоже идут по индексу."""
+        for url in (reverse('index'),
+                    reverse('group', args=[self.group.slug]),
+                    reverse('profile', args=[self.author.username]),
+                    reverse('follow_index'),
+                    reverse('followers', args=[self.author.username])):
+            with self.subTest(url=url):
+                page = self.authorized_client.get(url).context['page']
+                next_url = f'{url}?cursor={page.next_cursor}'
+                self.assertIndexedPlans(self.authorized_client, next_url)
+                page = self.authorized_client.get(
+                    f'{next_url}').context['page']
+                page = self.authorized_client.get(
+                    f'{url}?cursor={page.next_cursor}').context['page']
+                self.assertIndexedPlans(
+                    self.authorized_client,
+                    f'{url}?cursor={page.previous_cursor}')
@@ -0,0 +1,89 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from posts import pagecache, routers
+from posts.models import Post
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS, REPLICA_LAG=2)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        routers._state.__dict__.clear()
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.seen = []
+
+    def tearDown(self):
+        routers._state.__dict__.clear()
+
+    def view(self, write=False):
+        """ Представление запоминает, откуда читает, и может писать. """
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            self.seen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        return routers.ReplicaMiddleware(view)
+
+    def test_reads_go_to_replicas(self):
+        """ Чтения идут на реплики, записи — в основную базу. """
+        self.assertIn(self.router.db_for_read(Post), REPLICAS)
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_one_replica_per_request(self):
+        """ Все чтения запроса идут на одну реплику, следующий запрос
+        выбирает заново. """
+        def view(request):
+            self.seen.append({self.router.db_for_read(Post)
+                              for _ in range(20)})
+            return HttpResponse()
+
+        for _ in range(20):
+            routers.ReplicaMiddleware(view)(self.factory.get('/'))
+        self.assertTrue(all(len(aliases) == 1 for aliases in self.seen))
+        self.assertEqual(set.union(*self.seen), set(REPLICAS))
+        self.assertIsNone(routers._state.replica)
+
+    def test_without_replicas(self):
+        """ Без реплик все идет в основную базу. """
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+    def test_write_pins_client(self):
+        """ После записи клиент получает cookie и читает с основной базы. """
+        response = self.view(write=True)(self.factory.get('/'))
+        cookie = response.cookies['db_primary']
+        self.assertEqual(cookie['max-age'], 2)
+        self.assertEqual(self.seen, ['default'])
+        request = self.factory.get('/')
+        request.COOKIES['db_primary'] = '1'
+        self.view()(request)
+        self.assertEqual(self.seen[-1], 'default')
+        response = self.view()(self.factory.get('/'))
+        self.assertIn(self.seen[-1], REPLICAS)
+        self.assertNotIn('db_primary', response.cookies)
+
+    def test_unsafe_methods_use_primary(self):
+        """ POST читает с основной базы с самого начала. """
+        self.view()(self.factory.post('/'))
+        self.assertEqual(self.seen, ['default'])
+
+    def test_use_primary(self):
+        """ Пишущие представления закреплены за основной базой. """
+        view = routers.use_primary(
+            lambda request: HttpResponse(self.router.db_for_read(Post)))
+        response = routers.ReplicaMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(response.content, b'default')
+
+    def test_fresh_pages_are_not_settled(self):
+        """ Страницу моложе задержки реплик не кешируем. """
+        now = pagecache._fresh_generation()
+        self.assertFalse(pagecache.settled([now - 1000]))
+        self.assertTrue(pagecache.settled([now - 3000]))
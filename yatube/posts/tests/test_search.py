@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.about_cats = Post.objects.create(
+            text='Пост про котов и кошек', author=cls.author)
+        cls.about_dogs = Post.objects.create(
+            text='Пост про собак', author=cls.author)
+        Comment.objects.create(post=cls.about_dogs, author=cls.author,
+                               text='А у меня дома два кота')
+        for number in range(12):
+            Post.objects.create(text=f'Котики номер {number}',
+                                author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(reverse('search'),
+                                         {'q': query, **params})
+        return response, [post.pk for post in response.context['page']]
+
+    def test_search_posts_and_comments(self):
+        """ Поиск находит посты по тексту и по комментариям."""
+        _, found = self.search('собак')
+        self.assertEqual(found, [self.about_dogs.pk])
+        _, found = self.search('кошек')
+        self.assertEqual(found, [self.about_cats.pk])
+        _, found = self.search('кота')
+        self.assertEqual(found, [self.about_dogs.pk])
+
+    def test_nothing_found(self):
+        """ Поиск без совпадений сообщает, что ничего не найдено."""
+        response, found = self.search('жирафы')
+        self.assertEqual(found, [])
+        self.assertContains(response, 'Ничего не найдено.')
+        response = self.guest_client.get(reverse('search'))
+        self.assertNotContains(response, 'Ничего не найдено.')
+
+    def test_search_pages(self):
+        """ Результаты поиска листаются по токенам без повторов."""
+        response, first = self.search('котики')
+        self.assertEqual(len(first), 10)
+        page = response.context['page']
+        self.assertTrue(page.has_next())
+        _, second = self.search('котики', cursor=page.next_cursor)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+
+    def test_index_follows_edits_and_deletes(self):
+        """ Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.create(text='Уникальное слово',
+                                   author=self.author)
+        self.assertEqual(self.search('уникальное')[1], [post.pk])
+        post.text = 'Другой текст'
+        post.save()
+        self.assertEqual(self.search('уникальное')[1], [])
+        post.delete()
+        self.assertEqual(self.search('другой')[1], [])
+
+    def test_rebuild_search(self):
+        """ Команда rebuild_search восстанавливает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_post_fts')
+        self.assertEqual(self.search('собак')[1], [])
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(self.search('собак')[1], [self.about_dogs.pk])
+
+    def test_admin_search_uses_index(self):
+        """ Поиск в админке идет по полнотекстовому индексу."""
+        request = RequestFactory().get('/admin/posts/post/')
+        admin = site._registry[Post]
+        queryset, _ = admin.get_search_results(
+            request, Post.objects.all(), 'собак')
+        self.assertEqual(list(queryset), [self.about_dogs])
+        self.assertIn('posts_post_fts', str(queryset.query))
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from posts import sqlite
+
+
+@override_settings(SQLITE_BUSY_TIMEOUT=2000, SQLITE_RETRY_BACKOFF=0)
+class ConcurrentSQLiteTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None,
+                                     check_same_thread=False)
+        self.addCleanup(connection.close)
+        sqlite.configure(connection)
+        return connection
+
+    def test_configure(self):
+        """ Подключение получает WAL, mmap и busy_timeout. """
+        connection = self.connect()
+        pragmas = {name: connection.execute(f'PRAGMA {name}').fetchone()[0]
+                   for name in ('journal_mode', 'synchronous', 'busy_timeout')}
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1,
+                                   'busy_timeout': 2000})
+
+    def test_reader_not_blocked_by_writer(self):
+        """ Чтение идет, пока другая транзакция держит запись. """
+        writer, reader = self.connect(), self.connect()
+        writer.execute('CREATE TABLE post (text TEXT)')
+        sqlite.begin_immediate(writer.cursor())
+        writer.execute("INSERT INTO post VALUES ('новый')")
+        self.assertEqual(
+            reader.execute('SELECT COUNT(*) FROM post').fetchone(), (0,))
+        writer.execute('COMMIT')
+
+    def test_writer_waits_for_lock(self):
+        """ Второй писатель дожидается блокировки, ожидание в статистике. """
+        first, second = self.connect(), self.connect()
+        sqlite.begin_immediate(first.cursor())
+        timer = threading.Timer(0.1, first.execute, ['COMMIT'])
+        timer.start()
+        sqlite.begin_immediate(second.cursor())
+        second.execute('COMMIT')
+        timer.join()
+        stats = sqlite.stats()
+        self.assertEqual(stats['transactions'], 2)
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreaterEqual(stats['wait_ms'], 50)
+
+    def test_busy_is_counted(self):
+        """ Не дождавшийся блокировки писатель учитывается как SQLITE_BUSY."""
+        first, second = self.connect(), self.connect()
+        second.execute('PRAGMA busy_timeout = 10')
+        sqlite.begin_immediate(first.cursor())
+        with self.assertRaises(sqlite3.OperationalError):
+            sqlite.begin_immediate(second.cursor())
+        first.execute('COMMIT')
+        self.assertEqual(sqlite.stats()['busy'], 1)
+
+    def test_retry_on_busy(self):
+        """ Представление повторяется при SQLITE_BUSY, но не бесконечно. """
+        calls = []
+
+        @sqlite.retry_on_busy
+        def view(request):
+            calls.append(request)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        self.assertEqual(view(request).status_code, 200)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sqlite.stats()['retries'], 2)
+        with self.settings(SQLITE_WRITE_RETRIES=1):
+            calls.clear()
+            with self.assertRaises(OperationalError):
+                view(request)
+
+    def test_other_errors_are_not_retried(self):
+        @sqlite.retry_on_busy
+        def view(request):
+            raise OperationalError('no such table: posts_post')
+
+        with self.assertRaises(OperationalError):
+            view(RequestFactory().post('/'))
+        self.assertEqual(sqlite.stats()['retries'], 0)
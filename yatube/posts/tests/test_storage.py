@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import storage
+from posts.models import Post
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(size, mode='RGB', image_format='PNG', **params):
+    output = BytesIO()
+    Image.new(mode, size, 'red').save(output, image_format, **params)
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   IMAGE_MAX_SIZE=100, IMAGE_MAX_PIXELS=500 * 500)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='VG')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, content, name='image.png'):
+        return self.authorized_client.post(reverse('new_post'), data={
+            'text': 'Тестовый текст',
+            'image': SimpleUploadedFile(name, content)})
+
+    def test_identical_uploads_are_stored_once(self):
+        """ Одинаковые загрузки ссылаются на один файл."""
+        content = make_image((20, 20))
+        self.upload(content, 'first.png')
+        self.upload(content, 'second.png')
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertRegex(names.pop(), r'^posts/\w\w/\w\w/\w{64}\.jpg$')
+
+    def test_upload_is_decoded_once(self):
+        """ Файл и превью получаются из одной распаковки загрузки."""
+        with mock.patch('posts.storage._decode',
+                        wraps=storage._decode) as decode:
+            self.upload(make_image((400, 200)))
+        self.assertEqual(decode.call_count, 1)
+        post = Post.objects.get()
+        self.assertTrue(
+            post.image_preview.startswith('data:image/jpeg;base64,'))
+        self.assertTrue(post.image.name.endswith('.jpg'))
+
+    def test_upload_is_downscaled_and_reencoded(self):
+        """ Большое изображение уменьшается, альфа-канал сохраняется."""
+        self.upload(make_image((400, 200), mode='RGBA'))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.png'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.mode, 'RGBA')
+
+    def test_exif_is_applied_and_dropped(self):
+        """ Поворот из EXIF применяется, метаданные не сохраняются."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        self.upload(make_image((40, 20), image_format='JPEG', exif=exif),
+                    'photo.jpg')
+        with Image.open(Post.objects.get().image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertNotIn('exif', image.info)
+
+    def test_too_many_pixels_is_rejected(self):
+        """ Слишком большое по площади изображение не сохраняется."""
+        response = self.upload(make_image((600, 600), mode='L'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.exists())
@@ -0,0 +1,136 @@
+from io import StringIO
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import follows, suggestions
+from posts.models import Follow, Suggestion
+
+User = get_user_model()
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE=False)
+class SuggestionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {name: User.objects.create_user(username=name)
+                     for name in ('reader', 'a', 'b', 'c', 'd', 'e')}
+        graph = {'reader': ['a', 'b'],
+                 'a': ['b', 'c', 'd', 'reader'],
+                 'b': ['c', 'e'],
+                 'e': ['a']}
+        for name, authors in graph.items():
+            for author in authors:
+                Follow.objects.create(user=cls.users[name],
+                                      author=cls.users[author])
+
+    def setUp(self):
+        cache.clear()
+        self.reader = self.users['reader']
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def table(self):
+        rows = Suggestion.objects.select_related('user', 'author')
+        return {(row.user.username, row.rank):
+                (row.author.username, row.score) for row in rows}
+
+    def test_friends_of_friends(self):
+        """ Подсказки — авторы подписок, без своих подписок и себя. """
+        result = suggestions.rebuild(use_scipy=False)
+        self.assertEqual(result['engine'], 'python')
+        table = self.table()
+        self.assertEqual(table[('reader', 0)], ('c', 2.0))
+        self.assertEqual(table[('reader', 1)], ('d', 1.0))
+        self.assertEqual(table[('reader', 2)], ('e', 1.0))
+        self.assertNotIn(('reader', 3), table)
+        self.assertEqual(table[('e', 0)], ('reader', 1.0))
+
+    def test_blocks_replace_old_rows(self):
+        """ Пересчет блоками заменяет прежние подсказки всех пользователей."""
+        Suggestion.objects.create(user=self.users['d'],
+                                  author=self.users['a'], score=9, rank=0)
+        suggestions.rebuild(top_k=1, block_size=2, use_scipy=False)
+        self.assertEqual(self.table()[('reader', 0)], ('c', 2.0))
+        self.assertFalse(Suggestion.objects.filter(
+            user=self.users['d']).exists())
+        self.assertFalse(Suggestion.objects.filter(rank__gt=0).exists())
+
+    @skipIf(suggestions.sparse is None, 'нужны NumPy и SciPy')
+    def test_sparse_matches_python(self):
+        suggestions.rebuild(use_scipy=False)
+        expected = self.table()
+        result = suggestions.rebuild(block_size=2)
+        self.assertEqual(result['engine'], 'scipy')
+        self.assertEqual(self.table(), expected)
+
+    def test_suggested_for_reads_table_once(self):
+        """ Страница читает только таблицу, повтор — из кеша. """
+        suggestions.rebuild(use_scipy=False)
+        with self.assertNumQueries(1):
+            shown = suggestions.suggested_for(self.reader)
+        with self.assertNumQueries(0):
+            suggestions.suggested_for(self.reader)
+        self.assertEqual([row.author.username for row in shown],
+                         ['c', 'd', 'e'])
+
+    def test_follow_removes_suggestion(self):
+        """ Подписка на подсказанного автора убирает его из подсказок. """
+        suggestions.rebuild(use_scipy=False)
+        suggestions.suggested_for(self.reader)
+        follows.follow(self.reader, self.users['c'])
+        follows.apply_batch(self.reader, ['d'])
+        self.assertEqual([row.author.username for row
+                          in suggestions.suggested_for(self.reader)], ['e'])
+
+    def test_follow_refreshes_only_own_suggestions(self):
+        """ Подписка сбрасывает подсказки только этого пользователя. """
+        suggestions.rebuild(use_scipy=False)
+        other = self.users['e']
+        suggestions.suggested_for(self.reader)
+        suggestions.suggested_for(other)
+        url = reverse('profile', args=['a'])
+        anonymous_etag = self.client.get(url)['ETag']
+        follows.follow(self.reader, self.users['c'])
+        with self.assertNumQueries(0):
+            suggestions.suggested_for(other)
+        self.assertEqual(self.client.get(url)['ETag'], anonymous_etag)
+        suggestions.rebuild(use_scipy=False)
+        self.assertEqual(self.client.get(url)['ETag'], anonymous_etag)
+
+    def test_profile_validators_follow_viewer_suggestions(self):
+        """ ETag профиля для вошедшего зависит от его подсказок, 304
+        по-прежнему не ходит в базу. """
+        suggestions.rebuild(use_scipy=False)
+        url = reverse('profile', args=['a'])
+        first = self.authorized_client.get(url)
+        self.assertFalse(first.has_header('ETag'))
+        self.authorized_client.get(url)
+        etag = self.authorized_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        follows.follow(self.reader, self.users['c'])
+        self.assertNotEqual(self.authorized_client.get(url)['ETag'], etag)
+
+    def test_panel_on_pages(self):
+        suggestions.rebuild(use_scipy=False)
+        for url in (reverse('profile', args=['a']), reverse('follow_index')):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response,
+                                    reverse('profile_follow', args=['c']))
+        response = self.client.get(reverse('profile', args=['a']))
+        self.assertEqual(response.context['suggestions'], [])
+
+    def test_command(self):
+        output = StringIO()
+        call_command('suggest_follows', '--python', stdout=output)
+        self.assertIn('(python)', output.getvalue())
+        self.assertTrue(Suggestion.objects.exists())
@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B')
+
+
+def make_image(color):
+    output = BytesIO()
+    Image.new('RGB', (2, 2), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class PostImageTagTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='Тестовый',
+            author=User.objects.create_user(username='VG'),
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._queued.clear()
+        self.post = Post.objects.get(pk=self.post.pk)
+
+    def render(self):
+        return Template('{% load post_images %}{% post_image post %}'
+                        ).render(Context({'post': self.post}))
+
+    def test_preview_until_thumbnail_exists(self):
+        """ Пока миниатюр нет, выводится превью и создание в очереди."""
+        self.assertTrue(
+            self.post.image_preview.startswith('data:image/jpeg;base64,'))
+        html = self.render()
+        self.assertIn(self.post.image_preview, html)
+        self.assertIn(self.post.image.name, thumbnails._queued)
+
+    def test_thumbnail_after_generation(self):
+        """ После работы воркера выводятся WebP и srcset, растет версия."""
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        html = self.render()
+        self.assertIn('<source type="image/webp"', html)
+        for width in (320, 640, 960):
+            self.assertIn(f'.webp {width}w', html)
+            self.assertIn(f'.jpg {width}w', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn(self.post.image_preview, html)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 1)
+
+    def test_page_is_resolved_in_one_query(self):
+        """ Миниатюры всех постов страницы находятся одним запросом."""
+        # Разные цвета: одинаковые картинки хранилище сложило бы в один
+        # файл, и запрос искал бы одну миниатюру вместо трех.
+        posts = [Post.objects.create(text=f'Пост {number}',
+                                     author=self.post.author,
+                                     image=SimpleUploadedFile(
+                                         f'{number}.png', make_image(color)))
+                 for number, color in enumerate(('red', 'green', 'blue'))]
+        self.assertEqual(len({post.image.name for post in posts}), 3)
+        for post in posts:
+            thumbnails.generate(post.pk, post.image.name)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.attach(posts)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(all(post.thumbnail_urls for post in posts))
+
+    def test_stale_miss_in_cache_is_ignored(self):
+        """ Закешированное sorl отсутствие не скрывает готовую миниатюру."""
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        _, key = thumbnails._candidate(self.post.image, 'card')
+        cache.set(key, EMPTY_VALUE)
+        self.assertIsNotNone(
+            thumbnails.resolve([self.post.image])[self.post.image.name])
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.authorized_client.get(reverse('follow_index'))
+        return [post.text for post in response.context['page']]
+
+    def entries(self):
+        return TimelineEntry.objects.filter(user=self.reader)
+
+    def test_new_post_fans_out(self):
+        """ Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.entries().count(), 0)
+        Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(self.entries().count(), 1)
+        self.assertEqual(self.feed(), ['Новый'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """ Подписка добавляет старые посты, отписка их убирает."""
+        for number in range(3):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(self.feed(), ['Пост 2', 'Пост 1', 'Пост 0'])
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': 'author'}))
+        self.assertEqual(self.entries().count(), 0)
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_on_read(self):
+        """ Посты популярных авторов подтягиваются при чтении ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='Популярный', author=self.author)
+        self.assertEqual(self.entries().count(), 0)
+        self.assertEqual(self.feed(), ['Популярный'])
+
+    @override_settings(TIMELINE_MAX_ENTRIES=2)
+    def test_timeline_is_trimmed(self):
+        """ Лента обрезается до заданного размера."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(4):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        self.assertEqual(self.feed(), ['Пост 3', 'Пост 2'])
+        self.assertEqual(self.entries().count(), 2)
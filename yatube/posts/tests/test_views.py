@@ -6,10 +6,12 @@ from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post
+from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -283,3 +285,48 @@ class PostUnFollowViewsTest(TestCase):
                                            kwargs={'username': '2'}))
         count_new = Follow.objects.count()
         self.assertEqual(count + 1, count_new)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='VG')
+        cls.group = Group.objects.create(
+            title='Заголовок группы',
+            description='Тестовый текст',
+            slug='test-post-slug'
+        )
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(
+            User.objects.get(username='reader'))
+        cache.clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        cache.clear()
+        return len(queries)
+
+    def test_feed_queries_do_not_grow_with_page(self):
+        """ Число запросов ленты не зависит от числа постов на странице."""
+        urls = [reverse('index'),
+                reverse('group', kwargs={'slug': self.group.slug}),
+                reverse('profile', kwargs={'username': 'VG'}),
+                reverse('follow_index')]
+        post = Post.objects.create(text='Тестовый', author=self.author,
+                                   group=self.group)
+        Comment.objects.create(post=post, author=self.author, text='1')
+        single = [self.count_queries(url) for url in urls]
+        for number in range(9):
+            post = Post.objects.create(text=f'Тестовый {number}',
+                                       author=self.author, group=self.group)
+            Comment.objects.create(post=post, author=self.author, text='1')
+        for url, expected in zip(urls, single):
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), expected)
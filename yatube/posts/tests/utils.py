@@ -0,0 +1,62 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from posts.middleware import QueryRecorder
+
+# ``SCAN t`` без индекса: чтение таблицы целиком. Подзапросы, константы и
+# виртуальные таблицы полнотекстового поиска сканом не считаются.
+FULL_SCAN = re.compile(
+    r'SCAN (TABLE )?(?!SUBQUERY|CONSTANT|.*VIRTUAL TABLE)(?!.*USING)')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryBudgetMixin:
+    """ Проверки бюджета запросов для тестов представлений. """
+
+    def assertWithinBudget(self, client, url, url_name, budget=None):
+        """ Страница укладывается в бюджет и не повторяет запросы. """
+        budget = budget or settings.QUERY_BUDGETS[url_name]
+        with QueryRecorder() as recorder:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            recorder.count, budget,
+            f'{url}: {recorder.count} запросов при бюджете {budget}')
+        self.assertEqual(recorder.repeated(threshold=2), {},
+                         f'{url}: повторяющиеся запросы (N+1)')
+        return response
+
+
+class QueryPlanMixin:
+    """ Проверки планов запросов SQLite для тестов представлений. """
+
+    def capture_plans(self, client, url):
+        """ Планы ``EXPLAIN QUERY PLAN`` всех SELECT страницы. """
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((context['connection'], sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        for db, sql, params in statements:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            with db.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertIndexedPlans(self, client, url):
+        """ Ни один запрос страницы не читает таблицу целиком и не
+        сортирует во временном B-дереве. """
+        for sql, details in self.capture_plans(client, url):
+            for detail in details:
+                self.assertFalse(
+                    FULL_SCAN.match(detail) or TEMP_SORT in detail,
+                    f'{url}: {detail}\n{sql}')
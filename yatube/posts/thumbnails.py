@@ -0,0 +1,179 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+logger = logging.getLogger(__name__)
+
+GEOMETRIES = {
+    'card': {'size': (960, 339), 'widths': (320, 640, 960),
+             'sizes': '(max-width: 992px) 100vw, 960px',
+             'options': {'crop': 'center', 'upscale': True}},
+}
+
+# None — формат исходного файла.
+FORMATS = ('WEBP', None)
+
+_executor = None
+_queued = set()
+
+
+class LookupBackend(ThumbnailBackend):
+    """ Бэкенд sorl, который только ищет готовую миниатюру. """
+
+    def _options(self, source, options):
+        # Те же умолчания, что и в ThumbnailBackend.get_thumbnail, чтобы
+        # имя файла миниатюры совпало с созданным воркером.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_name(self, source, geometry_string, **options):
+        """ Имя файла миниатюры, как его построит ``get_thumbnail``. """
+        options = self._options(source, options)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+
+lookup = LookupBackend()
+
+
+def variants(size='card'):
+    """ Все миниатюры размера: формат, ширина, геометрия и опции.
+
+    Воркер создает их в этом порядке, поэтому последняя служит
+    признаком того, что готовы все.
+    """
+    geometry = GEOMETRIES[size]
+    width, height = geometry['size']
+    for image_format in FORMATS:
+        options = dict(geometry['options'])
+        if image_format:
+            options['format'] = image_format
+        for variant in geometry['widths']:
+            yield (image_format, variant,
+                   '%sx%s' % (variant, round(height * variant / width)),
+                   dict(options))
+
+
+def _candidate(image, size):
+    source = ImageFile(image)
+    urls = {}
+    name = None
+    for image_format, width, geometry, options in variants(size):
+        name = lookup.get_name(source, geometry, **options)
+        urls.setdefault(image_format, []).append(
+            (default.storage.url(name), width))
+    return urls, add_prefix(ImageFile(name, default.storage).key)
+
+
+def resolve(images, size='card'):
+    """ Ссылки на готовые миниатюры сразу для всех изображений страницы.
+
+    Возвращаем ``{имя файла: ссылки по форматам или None}``. Проверяется
+    только последняя миниатюра каждого изображения: сначала одним
+    ``get_many`` в кеше sorl, промахи — одним запросом к его таблице в
+    базе, которая переживает перезапуск процессов. Отсутствие миниатюры
+    не кешируется, чтобы созданные воркером миниатюры появлялись сразу.
+    """
+    candidates = {image.name: _candidate(image, size)
+                  for image in images if image}
+    keys = {key for _, key in candidates.values()}
+    kv_cache = default.kvstore.cache
+    present = {key for key, value in kv_cache.get_many(keys).items()
+               if value is not None and value != EMPTY_VALUE}
+    missing = keys - present
+    if missing:
+        stored = dict(KVStore.objects.filter(key__in=missing)
+                      .values_list('key', 'value'))
+        kv_cache.set_many(stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        present.update(stored)
+    return {name: urls if key in present else None
+            for name, (urls, key) in candidates.items()}
+
+
+def attach(posts, size='card'):
+    """ Кладем в ``post.thumbnail_urls`` ссылки на миниатюры постов. """
+    posts = [post for post in posts if post.image]
+    found = resolve([post.image for post in posts], size)
+    for post in posts:
+        post.thumbnail_urls = found[post.image.name]
+
+
+def _init_worker():
+    # Воркер получает копию процесса с открытыми соединениями к базе:
+    # их нельзя делить с родителем.
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    django.setup()
+    connections.close_all()
+
+
+def generate(post_id, name):
+    """ Создаем все миниатюры поста, обычно в процессе-воркере. """
+    from sorl.thumbnail import get_thumbnail
+
+    from . import pagecache
+    from .counters import bump_post_version
+    from .models import Post
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    try:
+        for size in GEOMETRIES:
+            for _, _, geometry, options in variants(size):
+                get_thumbnail(source, geometry, **options)
+        # Новая версия поста сбрасывает карточку с заглушкой, а новые
+        # поколения лент — закешированные страницы и их ETag.
+        bump_post_version(post_id)
+        post = (Post.objects.select_related('author', 'group')
+                .filter(pk=post_id).first())
+        if post is not None:
+            pagecache.bump(*pagecache.post_namespaces(post))
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        raise
+
+
+def _work(post_id, name):
+    try:
+        generate(post_id, name)
+    finally:
+        connections.close_all()
+
+
+def _submit(post_id, name):
+    global _executor
+    if settings.THUMBNAIL_WORKERS == 0:
+        try:
+            generate(post_id, name)
+        finally:
+            _queued.discard(name)
+        return
+    if _executor is None:
+        _executor = ProcessPoolExecutor(settings.THUMBNAIL_WORKERS,
+                                        initializer=_init_worker)
+    future = _executor.submit(_work, post_id, name)
+    future.add_done_callback(lambda _: _queued.discard(name))
+
+
+def enqueue(post):
+    """ Ставим создание миниатюр в очередь после коммита транзакции. """
+    name = post.image.name if post.image else None
+    if not name or name in _queued:
+        return
+    _queued.add(name)
+    transaction.on_commit(lambda: _submit(post.pk, name))
@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Max, Window
+from django.db.models.functions import RowNumber
+
+from .models import FEED_FIELDS, Follow, Post, TimelineEntry, UserStats
+
+FANOUT_CHUNK = 1000
+
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+
+
+def _entries(user_ids, post):
+    return [TimelineEntry(user_id=user_id, post_id=post.pk,
+                          author_id=post.author_id, pub_date=post.pub_date)
+            for user_id in user_ids]
+
+
+def is_pulled(author_id):
+    """ Посты авторов с огромной аудиторией не раскладываются при записи,
+    а подтягиваются в ленту при чтении."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT).exists()
+
+
+def fan_out(post):
+    """ Раскладываем новый пост по лентам подписчиков автора. """
+    if is_pulled(post.author_id):
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .values_list('user_id', flat=True))
+    chunk = []
+    for user_id in followers.iterator(chunk_size=FANOUT_CHUNK):
+        chunk.append(user_id)
+        if len(chunk) == FANOUT_CHUNK:
+            TimelineEntry.objects.bulk_create(_entries(chunk, post),
+                                              ignore_conflicts=True)
+            chunk = []
+    if chunk:
+        TimelineEntry.objects.bulk_create(_entries(chunk, post),
+                                          ignore_conflicts=True)
+
+
+def backfill(user_id, author_id, since=None):
+    """ Добавляем в ленту последние посты автора. """
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gt=since)
+    posts = posts.order_by('-pub_date').values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                       pub_date=pub_date)
+         for pk, pub_date in posts[:settings.TIMELINE_BACKFILL]],
+        ignore_conflicts=True)
+
+
+def backfill_authors(user_id, author_ids):
+    """ Добавляем в ленту последние посты нескольких авторов одним
+    ``INSERT ... SELECT``.
+
+    Посты нумеруются ``ROW_NUMBER()`` внутри каждого автора в порядке
+    индекса ``(author, pub_date, id)``, в ленту идут первые
+    ``TIMELINE_BACKFILL``, поэтому число запросов не зависит от числа
+    авторов.
+    """
+    if not author_ids:
+        return
+    ranked = (Post.objects.filter(author_id__in=author_ids).order_by()
+              .annotate(position=Window(
+                  RowNumber(), partition_by=[F('author_id')],
+                  order_by=[F('pub_date').desc(), F('pk').desc()]))
+              .values_list('pk', 'author_id', 'pub_date', 'position'))
+    alias = router.db_for_write(TimelineEntry)
+    connection = connections[alias]
+    select, params = ranked.query.get_compiler(alias).as_sql()
+    ops, opts = connection.ops, TimelineEntry._meta
+    columns = ', '.join(ops.quote_name(opts.get_field(name).column)
+                        for name in ('user', 'post', 'author', 'pub_date'))
+    source = ', '.join(ops.quote_name(Post._meta.get_field(name).column)
+                       for name in ('id', 'author', 'pub_date'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{ops.quote_name(opts.db_table)} ({columns}) '
+            f'SELECT %s, {source} FROM ({select}) ranked '
+            f'WHERE {ops.quote_name("position")} <= %s '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            [user_id, *params, settings.TIMELINE_BACKFILL])
+
+
+def prune(user_id, author_id):
+    """ Убираем из ленты посты автора после отписки. """
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def prune_authors(user_id, author_ids):
+    """ Убираем из ленты посты нескольких авторов одним DELETE. """
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id__in=author_ids).delete()
+
+
+def pull(user):
+    """ Подтягиваем в ленту новые посты авторов, которые не
+    раскладываются при записи. """
+    authors = Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+    for author_id in authors:
+        since = (TimelineEntry.objects.filter(user=user, author_id=author_id)
+                 .aggregate(last=Max('pub_date'))['last'])
+        backfill(user.pk, author_id, since)
+
+
+def trim(user):
+    """ Обрезаем ленту до ``TIMELINE_MAX_ENTRIES`` последних записей. """
+    edge = (TimelineEntry.objects.filter(user=user)
+            .order_by(*TIMELINE_ORDERING)
+            .values_list('pub_date', flat=True)
+            [settings.TIMELINE_MAX_ENTRIES:settings.TIMELINE_MAX_ENTRIES + 1])
+    edge = list(edge)
+    if edge:
+        TimelineEntry.objects.filter(user=user, pub_date__lte=edge[0]).delete()
+
+
+def rebuild(user_ids):
+    """ Заново собираем ленты пользователей из последних постов авторов,
+    на которых они подписаны. Нужно после массовой загрузки подписок в
+    обход сигналов. """
+    recent = {}
+    total = 0
+    for user_id in user_ids:
+        authors = Follow.objects.filter(user_id=user_id).exclude(
+            author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('author_id', flat=True)
+        entries = []
+        for author_id in authors:
+            if author_id not in recent:
+                recent[author_id] = list(
+                    Post.objects.filter(author_id=author_id)
+                    .order_by('-pub_date').values_list('pk', 'pub_date')
+                    [:settings.TIMELINE_BACKFILL])
+            entries += [(pub_date, pk, author_id)
+                        for pk, pub_date in recent[author_id]]
+        entries.sort(reverse=True)
+        entries = entries[:settings.TIMELINE_MAX_ENTRIES]
+        with transaction.atomic():
+            TimelineEntry.objects.filter(user_id=user_id).delete()
+            TimelineEntry.objects.bulk_create(
+                [TimelineEntry(user_id=user_id, post_id=pk,
+                               author_id=author_id, pub_date=pub_date)
+                 for pub_date, pk, author_id in entries])
+        total += len(entries)
+    return total
+
+
+def timeline_for(user):
+    """ Возвращаем записи ленты подписок пользователя. """
+    return (TimelineEntry.objects.filter(user=user)
+            .select_related('post__author', 'post__group')
+            .only('pub_date', 'post',
+                  *(f'post__{field}' for field in FEED_FIELDS)))
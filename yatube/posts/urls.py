@@ -1,12 +1,21 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('new/', views.post_new, name='new_post'),
     path("follow/", views.follow_index, name="follow_index"),
+    path('search/', views.search, name='search'),
+    path('api/posts/', api.posts, name='api_posts'),
+    path('api/posts/batch/', api.posts_batch, name='api_posts_batch'),
+    path('api/groups/<slug:slug>/posts/', api.group_posts,
+         name='api_group_posts'),
+    path('api/users/<str:username>/posts/', api.profile_posts,
+         name='api_profile_posts'),
+    path('api/follow/', api.follow_posts, name='api_follow_posts'),
+    path('api/follow/batch/', api.follow_batch, name='api_follow_batch'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/', views.post_edit,
@@ -15,6 +24,10 @@ urlpatterns = [
     path('500/', views.server_error),
     path("<username>/<int:post_id>/comment", views.add_comment,
          name="add_comment"),
+    path('<str:username>/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
+    path('<str:username>/followers/', views.followers, name='followers'),
+    path('<str:username>/following/', views.following, name='following'),
     path("<str:username>/follow/", views.profile_follow,
          name="profile_follow"),
     path("<str:username>/unfollow/", views.profile_unfollow,
@@ -1,77 +1,109 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import follows, pagecache, suggestions, thumbnails, timeline
+from .counters import get_user_stats
 from .forms import CommentForm, PostForm
-from .models import Group, Post, User, Follow
+from .pagecache import anonymous_cache, conditional_page
+from .routers import use_primary
+from .models import Follow, Group, Post, User
+from .paginator import get_page, paginate
+from .search import SearchPaginator, to_match
+from .sqlite import retry_on_busy
+from .templatetags.post_cards import card_key
 
 
+@conditional_page('index')
+@anonymous_cache('index')
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.PAG_VAL)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = paginate(request, post_list)
     return render(request, 'index.html', {'page': page})
 
 
+@conditional_page('group:{slug}')
+@anonymous_cache('group:{slug}')
 def group_posts(request, slug):
     """ Создаем функцию отображения сообществ."""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group.all()
-    paginator = Paginator(posts, settings.PAG_VAL)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.group.for_feed()
+    page = paginate(request, posts)
     return render(request, 'group.html', {"group": group, 'page': page})
 
 
+@conditional_page('author:{username}', viewer=(
+    suggestions.NAMESPACE, suggestions.user_namespace('{viewer}')))
+@anonymous_cache('author:{username}')
 def profile(request, username):
     """ Создаем функцию отображения страницы профиля."""
     author = get_object_or_404(User, username=username)
-    user = request.user
-    posts_author = author.posts.all()
-    post_count = posts_author.count()
-    paginator = Paginator(posts_author, settings.PAG_VAL)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    if user.is_authenticated:
-        follow = user.follower.values_list('author')
-        following = User.objects.filter(pk__in=follow)
-        return render(request, 'profile.html', {'author': author,
-                                                'page': page,
-                                                'post_count': post_count,
-                                                'following': following})
-    return render(request, 'profile.html', {'author': author,
-                                            'page': page,
-                                            'post_count': post_count})
-
-
+    stats = get_user_stats(author)
+    page = paginate(request, author.posts.for_feed())
+    context = {'author': author,
+               'page': page,
+               'stats': stats,
+               'post_count': stats.posts_count,
+               'following': follows.is_following(request.user, author),
+               'suggestions': suggestions.suggested_for(request.user)}
+    return render(request, 'profile.html', context)
+
+
+@conditional_page('author:{username}', 'post:{post_id}')
+@anonymous_cache('author:{username}', 'post:{post_id}')
 def post_view(request, username, post_id):
     """ Создаем функцию отображения страницы поста."""
-    author = get_object_or_404(User, username=username)
-    post_count = Post.objects.filter(author=author).count()
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    comments = post.comments.filter(post=post)
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             author__username=username, id=post_id)
+    author = post.author
+    stats = get_user_stats(author)
     form = CommentForm()
     return render(request, 'post.html', {'author': author,
-                                         "post_count": post_count,
+                                         'stats': stats,
+                                         "post_count": stats.posts_count,
                                          'post': post,
                                          'form': form,
-                                         'comments': comments})
+                                         'comments': comments_page(request,
+                                                                   post)})
+
+
+def comments_page(request, post):
+    """ Создаем страницу комментариев поста, новые сверху. """
+    return paginate(request, post.comments.select_related('author'),
+                    settings.COMMENTS_PAGE, ordering=('-created', '-pk'))
+
+
+@conditional_page('post:{post_id}')
+@anonymous_cache('post:{post_id}')
+def post_comments(request, username, post_id):
+    """ Создаем фрагмент со следующей страницей комментариев."""
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             author__username=username, id=post_id)
+    return render(request, 'includes/comment_list.html', {
+        'author': post.author,
+        'post': post,
+        'comments': comments_page(request, post)})
 
 
 @login_required
+@use_primary
+@retry_on_busy
 def post_new(request):
     """ Создаем функцию отображения создания поста."""
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        new_post.save()
+        with transaction.atomic():
+            new_post.save()
+            thumbnails.enqueue(new_post)
         return redirect('index')
     return render(request, 'new.html', {'form': form})
 
 
+@use_primary
+@retry_on_busy
 def post_edit(request, username, post_id):
     """ Создаем функцию отображения редактирования поста."""
     post = get_object_or_404(Post, id=post_id)
@@ -81,7 +113,9 @@ def post_edit(request, username, post_id):
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
+            thumbnails.enqueue(post)
         return redirect('post', username=author.username, post_id=post.id)
     return render(request, 'new.html', {'form': form, 'post': post})
 
@@ -100,6 +134,8 @@ def server_error(request):
 
 
 @login_required
+@use_primary
+@retry_on_busy
 def add_comment(request, username, post_id):
     """ Создаем функцию отображения комментария поста."""
     post = get_object_or_404(Post, id=post_id)
@@ -109,41 +145,107 @@ def add_comment(request, username, post_id):
         new_comment = form.save(commit=False)
         new_comment.author = request.user
         new_comment.post = post
-        new_comment.save()
+        with transaction.atomic():
+            new_comment.save()
         return redirect('post', username=author.username, post_id=post.id)
     return redirect('post', username=author.username, post_id=post.id)
 
 
+def search(request):
+    """ Создаем функцию поиска по постам и комментариям. """
+    query = request.GET.get('q', '').strip()
+    page = None
+    if to_match(query):
+        page = get_page(request, SearchPaginator(query, settings.PAG_VAL))
+    # Пустая страница ложна в шаблоне, поэтому сам факт поиска
+    # передается отдельно.
+    return render(request, 'search.html', {'query': query, 'page': page,
+                                           'searched': page is not None})
+
+
 @login_required
 def follow_index(request):
     """ Создаем функцию отображения постов подписок. """
-    post_follow = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_follow, settings.PAG_VAL)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'follow.html', {'page': page})
+    user = request.user
+    if not request.GET.get('cursor'):
+        timeline.pull(user)
+        timeline.trim(user)
+    page = paginate(request, timeline.timeline_for(user),
+                    ordering=timeline.TIMELINE_ORDERING)
+    page.object_list = [entry.post for entry in page.object_list]
+    # У ленты подписок нет своего поколения, поэтому ETag строится из
+    # ключей карточек страницы: строки уже прочитаны, рендер пропускаем.
+    generations = pagecache.generations([
+        pagecache.SITE, suggestions.NAMESPACE,
+        suggestions.user_namespace(user.pk)])
+    etag = pagecache.page_etag(request, [
+        *generations, page.page_links, page.next_cursor,
+        *(card_key(post, user) for post in page.object_list)])
+    response = pagecache.conditional(request, etag)
+    if response is None:
+        response = render(request, 'follow.html', {
+            'page': page,
+            'suggestions': suggestions.suggested_for(user)})
+    return pagecache.add_validators(response, etag)
 
 
 @login_required
+@use_primary
+@retry_on_busy
 def profile_follow(request, username):
     """ Создаем функцию возможности подписаться на автора. """
-    user = request.user
     author = get_object_or_404(User, username=username)
-    follow = user.follower.values_list('author')
-    following = User.objects.filter(pk__in=follow)
-    if author in following:
-        return redirect('profile', username=author.username)
-    if user != author:
-        Follow.objects.create(user=user, author=author)
-        return redirect('profile', username=author.username)
+    follows.follow(request.user, author)
     return redirect('profile', username=author.username)
 
 
 @login_required
+@use_primary
+@retry_on_busy
 def profile_unfollow(request, username):
     """ Создаем функцию возможности отписаться от автора. """
-    user = request.user
     author = get_object_or_404(User, username=username)
-    follow = get_object_or_404(Follow, user=user, author=author)
-    follow.delete()
+    follows.unfollow(request.user, author)
     return redirect('profile', username=author.username)
+
+
+def follow_list(request, username, followers):
+    """ Создаем страницу подписчиков или подписок автора.
+
+    Страницы идут по курсору от новых подписок к старым по индексам
+    ``follow_followers_idx`` и ``follow_following_idx``, флаги строк
+    считаются одним запросом на страницу.
+    """
+    author = get_object_or_404(User, username=username)
+    stats = get_user_stats(author)
+    if followers:
+        rows = Follow.objects.filter(author=author).select_related('user')
+    else:
+        rows = Follow.objects.filter(user=author).select_related('author')
+    page = paginate(request, rows, ordering=('-pk',))
+    people = [row.user if followers else row.author
+              for row in page.object_list]
+    viewed, mutual = follows.relations(
+        request.user, author, [person.pk for person in people], followers)
+    page.object_list = [{'person': person,
+                         'following': person.pk in viewed,
+                         'mutual': person.pk in mutual}
+                        for person in people]
+    context = {'author': author,
+               'page': page,
+               'stats': stats,
+               'post_count': stats.posts_count,
+               'followers': followers}
+    return render(request, 'follow_list.html', context)
+
+
+@anonymous_cache('author:{username}')
+def followers(request, username):
+    """ Создаем функцию отображения подписчиков автора. """
+    return follow_list(request, username, followers=True)
+
+
+@anonymous_cache('author:{username}')
+def following(request, username):
+    """ Создаем функцию отображения подписок автора. """
+    return follow_list(request, username, followers=False)
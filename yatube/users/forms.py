@@ -1,11 +1,38 @@
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
-
+from django.urls import get_resolver
 
 User = get_user_model()
 
 
+def reserved_usernames(patterns=None):
+    """ Первые части адресов сайта: search/, api/, admin/ и другие.
+
+    Профиль ``<username>/`` стоит после них, поэтому пользователь
+    с таким именем не открыл бы свою страницу или ее подстраницы.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    names = set()
+    for pattern in patterns:
+        first = str(pattern.pattern).lstrip('^').split('/')[0]
+        if not first:
+            names |= reserved_usernames(getattr(pattern, 'url_patterns', ()))
+        elif '<' not in first and '(' not in first:
+            names.add(first)
+    return names
+
+
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username in reserved_usernames():
+            raise forms.ValidationError(
+                'Это имя занято адресом сайта, выберите другое.',
+                code='reserved_username')
+        return username
@@ -36,7 +36,7 @@ ALLOWED_HOSTS = ["localhost",
 INSTALLED_APPS = [
     'about',
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.middleware.QueryBudgetMiddleware',
+    'posts.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +90,45 @@ DATABASES = {
     }
 }
 
+# Режим для нескольких процессов: WAL, mmap, busy_timeout и BEGIN
+# IMMEDIATE для транзакций (posts/sqlite.py).
+SQLITE_CONCURRENT = False
+
+if SQLITE_CONCURRENT:
+    DATABASES['default']['ENGINE'] = 'posts.backends.sqlite3'
+
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+# Миллисекунды.
+SQLITE_BUSY_TIMEOUT = 5000
+
+SQLITE_WRITE_RETRIES = 3
+
+# Секунды, удваиваются с каждой попыткой.
+SQLITE_RETRY_BACKOFF = 0.05
+
+# Число копий базы только для чтения: replica1, replica2, ... Локально
+# их наполняет manage.py sync_replicas.
+REPLICA_COUNT = 0
+
+DATABASE_REPLICAS = [f'replica{number}'
+                     for number in range(1, REPLICA_COUNT + 1)]
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': DATABASES['default']['ENGINE'],
+        'NAME': os.path.join(BASE_DIR, f'db-{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['posts.routers.ReplicaRouter']
+
+# Сколько секунд реплика может отставать. Столько же после записи
+# пользователь читает с основной базы.
+REPLICA_LAG = 2
+
+REPLICA_PIN_COOKIE = 'db_primary'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -143,8 +184,88 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 PAG_VAL = 10
 
+COMMENTS_PAGE = 20
+
+API_PAGE_MAX = 100
+
+API_BATCH_MAX = 500
+
+API_FOLLOW_BATCH_MAX = 5000
+
+# Общий слой кеша. Для нескольких воркеров он должен быть общим:
+# memcached или, локально, FileBasedCache в каталоге.
+CACHE_SHARED = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+# Перед общим слоем — LRU в памяти процесса для ключей с версией
+# (posts/caching.py).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'posts.caching.TieredCache',
+        'OPTIONS': {
+            'SHARED': CACHE_SHARED,
+            'LOCAL_PREFIXES': ('post-card:', 'anonymous-page:'),
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+        },
     }
 }
+
+# Сколько секунд остальные ждут того, кто заполняет ключ.
+CACHE_FILL_TIMEOUT = 2
+
+TIMELINE_MAX_ENTRIES = 1000
+
+TIMELINE_BACKFILL = 50
+
+TIMELINE_FANOUT_LIMIT = 10000
+
+# Сколько секунд кешировать множества подписок.
+FOLLOW_SET_TIMEOUT = 60 * 60
+
+# Списки подписок длиннее этого не кешируются целиком.
+FOLLOW_SET_MAX = 5000
+
+# Размер пачки массовых подписок.
+FOLLOW_BATCH_SIZE = 500
+
+# Сколько подсказок, на кого подписаться, хранить и показывать.
+SUGGESTIONS_TOP_K = 20
+
+SUGGESTIONS_SHOWN = 5
+
+# Сколько строк матрицы подписок перемножать за раз при пересчете
+# подсказок: от этого зависит пиковая память.
+SUGGESTIONS_BLOCK_SIZE = 20000
+
+SUGGESTIONS_TIMEOUT = 60 * 60
+
+QUERY_STATS_HEADER = False
+
+QUERY_REPEAT_THRESHOLD = 5
+
+QUERY_BUDGETS = {
+    'index': 5,
+    'group': 6,
+    'profile': 8,
+    'post': 6,
+    'follow_index': 8,
+    'post_comments': 4,
+    'followers': 8,
+    'following': 8,
+}
+
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+ANONYMOUS_PAGE_CACHE = True
+
+ANONYMOUS_PAGE_CACHE_TIMEOUT = 60 * 5
+
+THUMBNAIL_WORKERS = 2
+
+IMAGE_MAX_SIZE = 1920
+
+IMAGE_MAX_PIXELS = 40_000_000
+
+IMAGE_QUALITY = 85